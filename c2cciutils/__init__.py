@@ -2,31 +2,51 @@
 
 """c2cciutils shared utils function."""
 
+import concurrent.futures
+import contextlib
+import copy
+import functools
+import hashlib
 import json
 import os.path
+import random
 import re
+import shutil
 import subprocess  # nosec
-import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
 from pathlib import Path
-from typing import Any, cast
+from typing import Any, NamedTuple, cast
 
 import requests
 import ruamel.yaml
+import ruamel.yaml.comments
 
 import c2cciutils.configuration
 
 
 def get_repository() -> str:
-    """Get the current GitHub repository like `organization/project`."""
+    """
+    Get the current GitHub repository like `organization/project`.
+
+    The repository got from the git remote is stored in the persistent metadata cache.
+    """
     if "GITHUB_REPOSITORY" in os.environ:
         return os.environ["GITHUB_REPOSITORY"]
 
+    cache_path = metadata_cache_path("repository", str(Path.cwd()))
+    found, repository = read_metadata_cache(cache_path)
+    if found:
+        return cast("str", repository)
+
     remote_lines = subprocess.check_output(["git", "remote", "--verbose"]).decode().split("\n")  # noqa: S607
     remote_match = (
         re.match(r".*git@github.com:(.*).git .*", remote_lines[0]) if len(remote_lines) >= 1 else None
     )
 
     if remote_match:
+        write_metadata_cache(cache_path, remote_match.group(1))
         return remote_match.group(1)
 
     print("::warning::The GitHub repository isn't found, using 'camptocamp/project'")
@@ -39,7 +59,7 @@ def get_master_branch(repo: list[str]) -> tuple[str, bool]:
     master_branch = "master"
     success = False
     try:
-        default_branch_json = graphql(
+        default_branch_json = cached_graphql(
             "default_branch.graphql",
             {"name": repo[1], "owner": repo[0]},
             default=False,
@@ -52,18 +72,196 @@ def get_master_branch(repo: list[str]) -> tuple[str, bool]:
     return master_branch, success
 
 
-def get_config() -> c2cciutils.configuration.Configuration:
-    """Get the configuration, with project and auto detections."""
+@functools.cache
+def _schema() -> Any:
+    """Get the configuration JSON schema."""
+    with (Path(__file__).parent / "schema.json").open(encoding="utf-8") as schema_file:
+        return json.load(schema_file)
+
+
+def _resolve(schema: Any) -> Any:
+    """Resolve the local `$ref` of a JSON schema."""
+    while "$ref" in schema:
+        reference = schema["$ref"]
+        schema = _schema()
+        for name in reference.removeprefix("#/").split("/"):
+            schema = schema[name]
+    return schema
+
+
+def _apply_defaults(config: Any, schema: Any) -> None:
+    """Add the missing properties that have a default value in the JSON schema, recursively."""
+    for name, property_schema in _resolve(schema).get("properties", {}).items():
+        resolved_schema = _resolve(property_schema)
+        if name not in config and "default" in resolved_schema:
+            config[name] = copy.deepcopy(resolved_schema["default"])
+        if isinstance(config.get(name), dict):
+            _apply_defaults(config[name], resolved_schema)
+
+
+# A compiled JSON schema: get the errors of a value, as the path of the wrong element and the message
+_Validator = Callable[[Any, list[str | int]], Iterator[tuple[list[str | int], str]]]
+_JSON_TYPES: dict[str, Callable[[Any], bool]] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, int | float) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+def _compile_schema(schema: Any, compiled: dict[str, _Validator]) -> _Validator:
+    """
+    Compile a JSON schema into a validator function.
+
+    Supported keywords: `type`, `enum`, `properties`, `additionalProperties`, `items` and the local `$ref`,
+    the referenced schemas are compiled on first use, and shared.
+    """
+    if "$ref" in schema:
+        reference = schema["$ref"]
+
+        def validate_reference(value: Any, path: list[str | int]) -> Iterator[tuple[list[str | int], str]]:
+            if reference not in compiled:
+                compiled[reference] = _compile_schema(_resolve(schema), compiled)
+            yield from compiled[reference](value, path)
+
+        return validate_reference
+
+    types = schema.get("type")
+    if isinstance(types, str):
+        types = [types]
+    enum = schema.get("enum")
+    properties = {
+        name: _compile_schema(property_schema, compiled)
+        for name, property_schema in schema.get("properties", {}).items()
+    }
+    additional = schema.get("additionalProperties", True)
+    additional_validator = _compile_schema(additional, compiled) if isinstance(additional, dict) else None
+    items_validator = _compile_schema(schema["items"], compiled) if "items" in schema else None
+
+    def validate(value: Any, path: list[str | int]) -> Iterator[tuple[list[str | int], str]]:
+        if types is not None and not any(_JSON_TYPES[type_](value) for type_ in types):
+            yield path, f"should be of type {' or '.join(types)}"
+            return
+        if enum is not None and value not in enum:
+            yield path, f"should be one of {', '.join(json.dumps(item) for item in enum)}"
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in properties:
+                    yield from properties[key](item, [*path, key])
+                elif additional is False:
+                    yield [*path, key], "unknown property"
+                elif additional_validator is not None:
+                    yield from additional_validator(item, [*path, key])
+        if isinstance(value, list) and items_validator is not None:
+            for index, item in enumerate(value):
+                yield from items_validator(item, [*path, index])
+
+    return validate
+
+
+@functools.cache
+def _config_validator() -> _Validator:
+    """Get the configuration validator, compiled once by process."""
+    return _compile_schema(_schema(), {})
+
+
+def _position(path: Path, element_path: list[str | int]) -> tuple[int | None, int | None]:
+    """Get the position (line and column, starting at 1) of an element in a YAML file."""
+    with path.open(encoding="utf-8") as open_file:
+        node: Any = ruamel.yaml.YAML().load(open_file)
+    line, col = None, None
+    for key in element_path:
+        try:
+            line, col = (
+                node.lc.key(key) if isinstance(node, ruamel.yaml.comments.CommentedMap) else node.lc.item(key)
+            )
+        except (AttributeError, KeyError, IndexError, TypeError):
+            break
+        node = node[key]
+    return (line + 1, col + 1) if line is not None and col is not None else (None, None)
+
+
+def _validate_config(path: Path, config: Any) -> None:
+    """Validate the configuration, the errors are reported, and a `RuntimeError` is raised if any."""
+    errors = list(_config_validator()(config, []))
+    if not errors:
+        return
+    # Only in case of error, parse again the file to get the positions
+    for element_path, message in errors:
+        line, col = _position(path, element_path)
+        error(
+            "config",
+            f"{'.'.join(str(key) for key in element_path) or 'root'}: {message}",
+            str(path.relative_to(Path.cwd()) if path.is_relative_to(Path.cwd()) else path),
+            line,
+            col,
+        )
+    message = f"Invalid configuration file {path}"
+    raise RuntimeError(message)
+
+
+@functools.cache
+def _load_config(path: Path, fingerprint: tuple[int, int] | None) -> c2cciutils.configuration.Configuration:
+    """
+    Load the configuration file, validate it, and add the default values.
+
+    The result is stored in a persistent cache, used as long as the fingerprint (modification time and
+    size) of the configuration file and of the schema didn't change, the cache is best-effort, and it's
+    skipped when the configuration doesn't survive a JSON round-trip unchanged (non string keys, dates, ...).
+    """
+    schema_stat = (Path(__file__).parent / "schema.json").stat()
+    cache_fingerprint = [
+        str(path),
+        list(fingerprint) if fingerprint is not None else None,
+        schema_stat.st_mtime_ns,
+        schema_stat.st_size,
+    ]
+    cache_path = cache_directory() / "config" / f"{hashlib.sha256(str(path).encode()).hexdigest()}.json"
+    use_cache = os.environ.get("C2CCIUTILS_CACHE", "true").lower() != "false"
+    if use_cache:
+        cache = read_cache(cache_path)
+        if isinstance(cache, dict) and cache.get("fingerprint") == cache_fingerprint:
+            return cast("c2cciutils.configuration.Configuration", cache["config"])
+
     config: c2cciutils.configuration.Configuration = {}
-    config_path = Path("ci/config.yaml")
-    if config_path.exists():
-        with config_path.open(encoding="utf-8") as open_file:
-            yaml_ = ruamel.yaml.YAML()
-            config = yaml_.load(open_file)
+    if fingerprint is not None:
+        with path.open(encoding="utf-8") as open_file:
+            # The safe loader uses the C implementation when it's available
+            config = cast(
+                "c2cciutils.configuration.Configuration",
+                ruamel.yaml.YAML(typ="safe").load(open_file) or {},
+            )
+        _validate_config(path, config)
+    _apply_defaults(config, _schema())
 
+    if use_cache:
+        try:
+            json_compatible = json.loads(json.dumps(config)) == config
+        except (TypeError, ValueError):
+            json_compatible = False
+        if json_compatible:
+            write_cache(cache_path, {"fingerprint": cache_fingerprint, "config": config})
     return config
 
 
+def get_config() -> c2cciutils.configuration.Configuration:
+    """
+    Get the configuration, with project and auto detections, and the default values.
+
+    The configuration is loaded once by process, as long as the file didn't change, it's shared then it
+    shouldn't be modified.
+    """
+    config_path = Path("ci/config.yaml")
+    fingerprint = None
+    if config_path.exists():
+        stat = config_path.stat()
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+    return _load_config(config_path.resolve(), fingerprint)
+
+
 def error(
     checker: str,
     message: str,
@@ -108,19 +306,197 @@ def error(
         print(f"[{error_type}] {result}")
 
 
-def print_versions(config: c2cciutils.configuration.PrintVersions) -> bool:
+def cache_directory() -> Path:
+    """Get the directory used to store the persistent caches."""
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "c2cciutils"
+
+
+def _npmrc_has_prefix(path: Path) -> bool:
+    """Check if the npm configuration file sets the prefix."""
+    try:
+        with path.open(encoding="utf-8") as npmrc_file:
+            return any(line.split("=", 1)[0].strip() == "prefix" for line in npmrc_file if "=" in line)
+    except (OSError, ValueError):
+        return False
+
+
+def _fingerprint_paths(cmd: list[str]) -> list[Path] | None:
+    """
+    Get the paths that change when the output of the command changes.
+
+    Return None if we don't know them, then the output shouldn't be cached.
+    """
+    if not cmd:
+        return None
+    if cmd[0] == "dpkg":
+        return [Path("/var/lib/dpkg/status")]
+    binary = shutil.which(cmd[0])
+    if binary is None:
+        return None
+    paths = [Path(binary), Path(binary).resolve()]
+    prefix = Path(binary).parent.parent
+    if cmd[0].startswith("python"):
+        packages = [*prefix.glob("lib/python3*/*-packages"), *prefix.glob("local/lib/python3*/*-packages")]
+        # Probably a wrapper like a pyenv shim
+        if not packages:
+            return None
+        paths += [*packages, *Path.home().glob(".local/lib/python3*/site-packages")]
+    elif cmd[0] in ("node", "npm"):
+        # The npm configuration from the environment variables is case-insensitive
+        npm_environment = {name.lower(): value for name, value in os.environ.items()}
+        # The global packages directory is elsewhere if the prefix is configured
+        if "prefix" in npm_environment or "npm_config_prefix" in npm_environment:
+            return None
+        npmrc_paths = [
+            Path(npm_environment.get("npm_config_userconfig", Path.home() / ".npmrc")),
+            Path(npm_environment.get("npm_config_globalconfig", prefix / "etc" / "npmrc")),
+            Path(".npmrc"),
+        ]
+        if any(_npmrc_has_prefix(path) for path in npmrc_paths):
+            return None
+        packages = [prefix / "lib" / "node_modules"]
+        if not packages[0].exists():
+            return None
+        # The configuration files are also in the fingerprint, in case the prefix is added
+        paths += [*packages, *npmrc_paths]
+    elif cmd[:2] == ["docker", "compose"]:
+        paths += [
+            *Path.home().glob(".docker/cli-plugins/docker-compose"),
+            *Path("/usr").glob("*/docker/cli-plugins/docker-compose"),
+        ]
+    return paths
+
+
+def read_cache(cache_path: Path) -> Any:
+    """Read a persistent cache file, None if it's missing or not readable, the cache is best-effort."""
+    try:
+        with cache_path.open(encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(cache_path: Path, content: Any) -> None:
+    """Write a persistent cache file, the errors are ignored, the cache is best-effort."""
+    # Write then rename, to never read a partial file
+    temporary_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with temporary_path.open("w", encoding="utf-8") as cache_file:
+            json.dump(content, cache_file)
+        temporary_path.replace(cache_path)
+    except (OSError, TypeError, ValueError):
+        with contextlib.suppress(OSError):
+            temporary_path.unlink(missing_ok=True)
+
+
+def cached_command_output(cmd: list[str], check: bool = True, timeout: float | None = None) -> str:
+    """
+    Get the output (standard and error) of a command.
+
+    The output is stored in a persistent cache, and reused as long as the fingerprint (modification time
+    and size) of the command binary, and of its related packages directories, database or configuration,
+    didn't change.
+    Set the environment variable `C2CCIUTILS_CACHE` to `false` to disable the cache.
+
+    Arguments:
+        cmd: The command
+        check: Raise a `subprocess.CalledProcessError` if the command fails
+        timeout: Kill the command and raise a `subprocess.TimeoutExpired` after this number of seconds
+
+    """
+    paths = _fingerprint_paths(cmd) if os.environ.get("C2CCIUTILS_CACHE", "true").lower() != "false" else None
+    cache_path = (
+        cache_directory() / "commands" / f"{hashlib.sha256(json.dumps(cmd).encode()).hexdigest()}.json"
+    )
+    fingerprint = None
+    if paths is not None:
+        fingerprint = [
+            [str(path), path.stat().st_mtime_ns, path.stat().st_size] for path in paths if path.exists()
+        ]
+        cache = read_cache(cache_path)
+        if isinstance(cache, dict) and cache.get("fingerprint") == fingerprint:
+            return cast("str", cache["output"])
+
+    process = subprocess.run(  # noqa: S603
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        check=check,
+        timeout=timeout,
+    )
+    output = process.stdout.decode()
+    if fingerprint is not None and process.returncode == 0:
+        write_cache(cache_path, {"cmd": cmd, "fingerprint": fingerprint, "output": output})
+    return output
+
+
+def offline() -> bool:
+    """Check if we are in offline mode, set with the environment variable `C2CCIUTILS_OFFLINE`."""
+    return os.environ.get("C2CCIUTILS_OFFLINE", "false").lower() == "true"
+
+
+def metadata_cache_path(name: str, key: Any) -> Path:
+    """Get the path of a value in the persistent metadata cache."""
+    return (
+        cache_directory()
+        / "metadata"
+        / f"{name}-{hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()}.json"
+    )
+
+
+def read_metadata_cache(cache_path: Path) -> tuple[bool, Any]:
+    """
+    Read a value from the persistent metadata cache.
+
+    The values expire after `C2CCIUTILS_CACHE_TTL` seconds (default: one day), except in offline mode.
+    The environment variable `C2CCIUTILS_CACHE` can be set to `false` to disable the cache, or to
+    `refresh` to ignore the cached values.
+
+    Return if the value is found, and the value.
+    """
+    mode = os.environ.get("C2CCIUTILS_CACHE", "true").lower()
+    if mode in ("false", "refresh") and not offline():
+        return False, None
+    cache = read_cache(cache_path)
+    if not isinstance(cache, dict) or "time" not in cache:
+        return False, None
+    if offline() or time.time() - cache["time"] < int(os.environ.get("C2CCIUTILS_CACHE_TTL", "86400")):
+        return True, cache["value"]
+    return False, None
+
+
+def write_metadata_cache(cache_path: Path, value: Any) -> None:
+    """Write a value in the persistent metadata cache."""
+    if os.environ.get("C2CCIUTILS_CACHE", "true").lower() != "false":
+        write_cache(cache_path, {"time": time.time(), "value": value})
+
+
+def clear_metadata_cache() -> None:
+    """Remove all the values of the persistent metadata cache."""
+    shutil.rmtree(cache_directory() / "metadata", ignore_errors=True)
+
+
+def print_versions(config: c2cciutils.configuration.PrintVersions, timeout: float | None = None) -> bool:
     """
     Print some tools version.
 
+    The commands are run concurrently, and printed in order.
+
     Arguments:
         config: The print configuration
+        timeout: Kill the commands that run longer than this number of seconds
 
     """
-    for version in config.get("versions", c2cciutils.configuration.PRINT_VERSIONS_VERSIONS_DEFAULT):
+    versions = config.get("versions", c2cciutils.configuration.PRINT_VERSIONS_VERSIONS_DEFAULT)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(versions), 1)) as executor:
+        futures = [
+            executor.submit(cached_command_output, list(version.get("cmd", [])), timeout=timeout)
+            for version in versions
+        ]
+    for version, future in zip(versions, futures, strict=True):
         try:
-            sys.stdout.flush()
-            sys.stderr.flush()
-            current_version = subprocess.check_output(version.get("cmd", [])).decode()  # noqa: S603
+            current_version = future.result()
             print(f"{version.get('prefix', '')}{current_version}")
         except PermissionError as exception:
             error(
@@ -140,6 +516,12 @@ def print_versions(config: c2cciutils.configuration.PrintVersions) -> bool:
                 f"{version.get('name')}: no present: {exception}",
                 error_type="warning",
             )
+        except subprocess.TimeoutExpired as exception:
+            error(
+                "print_version",
+                f"{version.get('name')}: killed: {exception}",
+                error_type="warning",
+            )
 
     return True
 
@@ -163,6 +545,19 @@ def gopass(key: str, default: str | None = None) -> str | None:
         raise
 
 
+@functools.cache
+def _github_token() -> str | None:
+    """Get the GitHub token, resolved once by process, None if it's not available."""
+    try:
+        return (
+            os.environ["GITHUB_TOKEN"].strip()
+            if "GITHUB_TOKEN" in os.environ
+            else gopass("gs/ci/github/token/gopass")
+        )
+    except FileNotFoundError:
+        return None
+
+
 def add_authorization_header(headers: dict[str, str]) -> dict[str, str]:
     """
     Add the Authorization header needed to be authenticated on GitHub.
@@ -173,17 +568,10 @@ def add_authorization_header(headers: dict[str, str]) -> dict[str, str]:
     Return the headers (to be chained)
 
     """
-    try:
-        token = (
-            os.environ["GITHUB_TOKEN"].strip()
-            if "GITHUB_TOKEN" in os.environ
-            else gopass("gs/ci/github/token/gopass")
-        )
+    token = _github_token()
+    if token is not None:
         headers["Authorization"] = f"Bearer {token}"
-    except FileNotFoundError:
-        return headers
-    else:
-        return headers
+    return headers
 
 
 def check_response(response: requests.Response, raise_for_status: bool = True) -> Any:
@@ -199,9 +587,196 @@ def check_response(response: requests.Response, raise_for_status: bool = True) -
         response.raise_for_status()
 
 
+class RateLimit(NamedTuple):
+    """The GitHub rate limit budget, from the `X-RateLimit-*` headers."""
+
+    limit: int
+    remaining: int
+    used: int
+    reset: int
+    """The time when the budget is reset, in seconds since the epoch."""
+    resource: str
+
+
+def get_rate_limit(response: requests.Response) -> RateLimit | None:
+    """Get the rate limit budget from the response headers, None if they are missing."""
+    try:
+        return RateLimit(
+            limit=int(response.headers["X-RateLimit-Limit"]),
+            remaining=int(response.headers["X-RateLimit-Remaining"]),
+            used=int(response.headers.get("X-RateLimit-Used", "0")),
+            reset=int(response.headers["X-RateLimit-Reset"]),
+            resource=response.headers.get("X-RateLimit-Resource", "graphql"),
+        )
+    except (KeyError, ValueError):
+        return None
+
+
+# The requests are paced when the remaining budget is under this ratio of the limit
+_PACING_RATIO = 0.1
+
+
+def _should_retry(response: requests.Response, rate_limit: RateLimit | None) -> bool:
+    """Check if the response is a gateway error, or a primary or secondary rate limit error."""
+    if response.status_code in (502, 503, 504):
+        return True
+    exhausted = rate_limit is not None and rate_limit.remaining == 0
+    if response.status_code in (403, 429):
+        return "Retry-After" in response.headers or exhausted or "rate limit" in response.text.lower()
+    # The GraphQL API can also return the primary rate limit error in the response content
+    return response.status_code == 200 and exhausted and '"RATE_LIMITED"' in response.text
+
+
+@functools.cache
+def _graphql_query(query_file: str) -> str:
+    """Get the GraphQL query, read once by process."""
+    with (Path(__file__).parent / query_file).open(encoding="utf-8") as query_open:
+        return query_open.read()
+
+
+class GraphQL:
+    """
+    Client of the GitHub GraphQL API.
+
+    All the requests are done with the same HTTP session, then on a pooled connection.
+
+    The requests are paced when the rate limit budget runs low, to spread the remaining budget until
+    its reset, and retried with a jittered exponential backoff on the rate limit and gateway errors.
+    The number of retries can be configured with the `C2CCIUTILS_RETRIES` environment variable.
+    """
+
+    def __init__(
+        self,
+        url: str | None = None,
+        timeout: int | None = None,
+        retries: int | None = None,
+    ) -> None:
+        """Construct."""
+        self.url = url or os.environ.get("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+        self.timeout = timeout or int(os.environ.get("C2CCIUTILS_TIMEOUT", "30"))
+        self.retries = retries if retries is not None else int(os.environ.get("C2CCIUTILS_RETRIES", "5"))
+        self.session = requests.Session()
+        self.session.headers.update(add_authorization_header({"Content-Type": "application/json"}))
+        self.rate_limit: RateLimit | None = None
+        """The last known rate limit budget."""
+        self._lock = threading.Lock()
+
+    def _pace(self) -> None:
+        """Wait before the next request if the budget runs low."""
+        with self._lock:
+            rate_limit = self.rate_limit
+        if rate_limit is None or rate_limit.remaining > rate_limit.limit * _PACING_RATIO:
+            return
+        delay = max(rate_limit.reset - time.time(), 0) / max(rate_limit.remaining, 1)
+        if delay > 0:
+            print(f"Rate limit: {rate_limit.remaining} requests remaining, wait {delay:.1f} seconds")
+            time.sleep(delay)
+
+    def post(self, data: dict[str, Any]) -> requests.Response:
+        """Post a request, paced and retried according to the rate limit."""
+        if offline():
+            message = "GitHub isn't reachable in offline mode"
+            raise RuntimeError(message)
+        attempt = 0
+        while True:
+            self._pace()
+            try:
+                response = self.session.post(self.url, data=json.dumps(data), timeout=self.timeout)
+            except requests.ConnectionError:
+                if attempt >= self.retries:
+                    raise
+                time.sleep(random.uniform(0, 2**attempt))  # noqa: S311 # nosec
+                attempt += 1
+                continue
+            rate_limit = get_rate_limit(response)
+            if rate_limit is not None:
+                with self._lock:
+                    self.rate_limit = rate_limit
+            if attempt >= self.retries or not _should_retry(response, rate_limit):
+                return response
+            if "Retry-After" in response.headers:
+                delay = float(response.headers["Retry-After"])
+            elif rate_limit is not None and rate_limit.remaining == 0:
+                delay = max(rate_limit.reset - time.time(), 0) + 1
+            else:
+                # Full jitter, to spread the retries of the concurrent jobs
+                delay = random.uniform(0, 2**attempt)  # noqa: S311 # nosec
+            print(f"::warning::GitHub error {response.status_code}, retry in {delay:.1f} seconds")
+            time.sleep(delay)
+            attempt += 1
+
+    def __call__(self, query_file: str, variables: dict[str, Any], default: Any = None) -> Any:
+        """
+        Get a graphql result from GitHub.
+
+        Arguments:
+            query_file: Relative path from this file to the GraphQL query file.
+            variables: The query variables
+            default:  The return result if we are not authorized to get the resource
+
+        Return the data result
+        In case of error it throw an exception
+
+        """
+        return self.query(_graphql_query(query_file), variables, default)
+
+    def query(
+        self,
+        query: str,
+        variables: dict[str, Any],
+        default: Any = None,
+        allow_not_found: bool = False,
+    ) -> Any:
+        """
+        Get a graphql result from GitHub, from the query text.
+
+        Arguments:
+            query: The GraphQL query
+            variables: The query variables
+            default:  The return result if we are not authorized to get the resource
+            allow_not_found: Return the partial data (with null) when all the errors are `NOT_FOUND`
+
+        Return the data result
+        In case of error it throw an exception
+
+        """
+        http_response = self.post(
+            {
+                "query": query,
+                "variables": variables,
+            },
+        )
+        if http_response.status_code in (401, 403) and default is not None:
+            print(f"::warning::GraphQL error: {http_response.status_code}, use default value")
+            check_response(http_response, raise_for_status=False)
+            return default
+        check_response(http_response)
+        json_response = http_response.json()
+
+        if "errors" in json_response and not (
+            allow_not_found
+            and json_response.get("data")
+            and all(error.get("type") == "NOT_FOUND" for error in json_response["errors"])
+        ):
+            message = f"GraphQL error: {json.dumps(json_response['errors'], indent=2)}"
+            raise RuntimeError(message)
+        for error in json_response.get("errors", []):
+            print(f"::warning::GraphQL error: {error.get('message', error)}")
+        if "data" not in json_response:
+            message = f"GraphQL no data: {json.dumps(json_response, indent=2)}"
+            raise RuntimeError(message)
+        return cast("dict[str, Any]", json_response["data"])
+
+
+@functools.cache
+def graphql_client() -> GraphQL:
+    """Get the GraphQL client shared by the process."""
+    return GraphQL()
+
+
 def graphql(query_file: str, variables: dict[str, Any], default: Any = None) -> Any:
     """
-    Get a graphql result from GitHub.
+    Get a graphql result from GitHub, with the shared client.
 
     Arguments:
         query_file: Relative path from this file to the GraphQL query file.
@@ -212,35 +787,167 @@ def graphql(query_file: str, variables: dict[str, Any], default: Any = None) ->
     In case of error it throw an exception
 
     """
-    with (Path(__file__).parent / query_file).open(encoding="utf-8") as query_open:
-        query = query_open.read()
+    return graphql_client()(query_file, variables, default)
 
-    http_response = requests.post(
-        os.environ.get("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql"),
-        data=json.dumps(
-            {
-                "query": query,
-                "variables": variables,
-            },
-        ),
-        headers=add_authorization_header(
-            {
-                "Content-Type": "application/json",
-            },
+
+_VARIABLE_RE = re.compile(r"\$\w+")
+_QUERY_RE = re.compile(r"^\s*query\s*\w*\s*\((.*?)\)\s*\{(.*)\}\s*$", re.DOTALL)
+
+
+@functools.cache
+def _graphql_selection(query_file: str) -> tuple[list[str], str]:
+    """Get the variables definitions (like `$name: String!`) and the selection of a GraphQL query file."""
+    match = _QUERY_RE.match(_graphql_query(query_file))
+    if match is None:
+        message = f"Unsupported GraphQL query in {query_file}"
+        raise ValueError(message)
+    return [definition.strip() for definition in match.group(1).split(",")], match.group(2).strip()
+
+
+def _aliased_query(query_file: str, items: list[dict[str, Any]]) -> tuple[str, dict[str, Any]]:
+    """
+    Build a query from the query file with one aliased selection by item, to get them with one request.
+
+    The variables are suffixed with the item index, the aliases are `item<index>`.
+    """
+    definitions, selection = _graphql_selection(query_file)
+    item_definitions = []
+    selections = []
+    variables = {}
+    for index, item in enumerate(items):
+        item_definitions += [
+            _VARIABLE_RE.sub(lambda match: f"{match.group(0)}{index}", definition)  # noqa: B023
+            for definition in definitions
+        ]
+        variables.update({f"{name}{index}": value for name, value in item.items()})
+        item_selection = _VARIABLE_RE.sub(lambda match: f"{match.group(0)}{index}", selection)  # noqa: B023
+        selections.append(f"  item{index}: {item_selection}")
+    return "query ({}) {{\n{}\n}}".format(", ".join(item_definitions), "\n".join(selections)), variables
+
+
+def _paginate(
+    query_file: str,
+    items: dict[Any, dict[str, Any]],
+    get_connection: Callable[[Any], Any],
+    batch_size: int,
+) -> Iterator[tuple[Any, Any]]:
+    """
+    Get the nodes of a paginated connection, for all the items.
+
+    The items are requested by batches of aliased selections, and each item is paged with its cursor,
+    until its last page.
+
+    Arguments:
+        query_file: The query, with the `$after` variable, one selection is used by item
+        items: The variables of each item, by item key
+        get_connection: Get the connection from the item result, None if the item isn't found
+        batch_size: The maximum number of items in one request
+
+    Yield the item key and the node.
+    """
+    pending = {key: {**variables, "after": None} for key, variables in items.items()}
+    while pending:
+        keys = list(pending)[:batch_size]
+        query, variables = _aliased_query(query_file, [pending[key] for key in keys])
+        # A not found item is null, it shouldn't fail the whole batch
+        data = graphql_client().query(query, variables, allow_not_found=True)
+        for index, key in enumerate(keys):
+            connection = get_connection(data[f"item{index}"])
+            if connection is None:
+                del pending[key]
+                continue
+            for node in connection["nodes"]:
+                yield key, node
+            if connection["pageInfo"]["hasNextPage"]:
+                pending[key]["after"] = connection["pageInfo"]["endCursor"]
+            else:
+                del pending[key]
+
+
+def iter_branches(
+    repositories: list[str],
+    page_size: int = 100,
+    batch_size: int = 20,
+) -> Iterator[tuple[str, Any]]:
+    """
+    Get all the branches of the repositories, page by page, with the `branches.graphql` query.
+
+    Arguments:
+        repositories: The repositories, like `organization/project`
+        page_size: The number of branches by page
+        batch_size: The maximum number of repositories in one request
+
+    Yield the repository and the branch (`name` and the last commits `oid`), the not found
+    repositories are skipped.
+    """
+    return _paginate(
+        "branches.graphql",
+        {
+            repository: {
+                "owner": repository.split("/")[0],
+                "name": repository.split("/")[1],
+                "first": page_size,
+            }
+            for repository in repositories
+        },
+        lambda repository: repository["refs"] if repository is not None else None,
+        batch_size,
+    )
+
+
+def iter_commits(
+    repository: str,
+    branches: list[str],
+    page_size: int = 100,
+    batch_size: int = 20,
+) -> Iterator[tuple[str, Any]]:
+    """
+    Get the commits history of the branches, page by page, with the `commits.graphql` query.
+
+    Arguments:
+        repository: The repository, like `organization/project`
+        branches: The branches names
+        page_size: The number of commits by page
+        batch_size: The maximum number of branches in one request
+
+    Yield the branch and the commit (`oid`), the not found branches are skipped.
+    """
+    owner, name = repository.split("/")
+    return _paginate(
+        "commits.graphql",
+        {
+            branch: {
+                "owner": owner,
+                "name": name,
+                "branch": branch,
+                "first": page_size,
+            }
+            for branch in branches
+        },
+        lambda result: (
+            result["ref"]["target"]["history"] if result is not None and result["ref"] is not None else None
         ),
-        timeout=int(os.environ.get("C2CCIUTILS_TIMEOUT", "30")),
+        batch_size,
     )
-    if http_response.status_code in (401, 403) and default is not None:
-        print(f"::warning::GraphQL error: {http_response.status_code}, use default value")
-        check_response(http_response, raise_for_status=False)
-        return default
-    check_response(http_response)
-    json_response = http_response.json()
-
-    if "errors" in json_response:
-        message = f"GraphQL error: {json.dumps(json_response['errors'], indent=2)}"
-        raise RuntimeError(message)
-    if "data" not in json_response:
-        message = f"GraphQL no data: {json.dumps(json_response, indent=2)}"
-        raise RuntimeError(message)
-    return cast("dict[str, Any]", json_response["data"])
+
+
+def cached_graphql(query_file: str, variables: dict[str, Any], default: Any = None) -> Any:
+    """
+    Get a graphql result from GitHub, stored in the persistent metadata cache.
+
+    To be used for the values that almost never change, the default result isn't stored.
+
+    Arguments:
+        query_file: Relative path from this file to the GraphQL query file.
+        variables: The query variables
+        default:  The return result if we are not authorized to get the resource
+
+    """
+    cache_path = metadata_cache_path("graphql", [query_file, variables])
+    found, result = read_metadata_cache(cache_path)
+    if found:
+        return result
+    result = graphql(query_file, variables, default)
+    if result is not default:
+        write_metadata_cache(cache_path, result)
+    return result
@@ -21,6 +21,16 @@ class Configuration(TypedDict, total=False):
     The print versions configuration
     """
 
+    env: "EnvironmentConfiguration"
+    r"""
+    Environment configuration.
+
+    The c2cciutils-env configuration
+
+    default:
+      {}
+    """
+
     k8s: "K8SConfiguration"
     r"""
     K8s configuration.
@@ -57,6 +67,122 @@ DbConfiguration = TypedDict(
 )
 
 
+ENVIRONMENT_CONFIGURATION_DEFAULT: dict[str, Any] = {}
+r""" Default value of the field path 'configuration env' """
+
+
+ENVIRONMENT_SECTIONS_DEFAULT: dict[str, Any] = {}
+r""" Default value of the field path 'Environment configuration sections' """
+
+
+ENVIRONMENT_SECTION_ENABLED_DEFAULT = True
+r""" Default value of the field path 'Environment section enabled' """
+
+
+ENVIRONMENT_SECTION_TIMEOUT_DEFAULT = 60
+r""" Default value of the field path 'Environment section timeout' """
+
+
+class EnvironmentConfiguration(TypedDict, total=False):
+    r"""
+    Environment configuration.
+
+    The c2cciutils-env configuration
+
+    default:
+      {}
+    """
+
+    sections: "EnvironmentSections"
+    r"""
+    Environment sections.
+
+    The configuration of each section
+
+    default:
+      {}
+    """
+
+    github_event_keys: list[str]
+    r"""
+    Environment GitHub event keys.
+
+    The keys of the GitHub event object to print, with dots for the sub keys (e.g. `pull_request.head.ref`), default: all
+    """
+
+
+class EnvironmentSection(TypedDict, total=False):
+    r"""
+    Environment section.
+
+    The configuration of a c2cciutils-env section
+    """
+
+    enabled: bool
+    r"""
+    Environment section enabled.
+
+    Print the section
+
+    default: True
+    """
+
+    timeout: int | float
+    r"""
+    Environment section timeout.
+
+    The time budget of the section, in seconds, the section is stopped and reported as a warning when it's exceeded
+
+    default: 60
+    """
+
+
+# | Environment sections.
+# |
+# | The configuration of each section
+# |
+# | default:
+# |   {}
+EnvironmentSections = TypedDict(
+    "EnvironmentSections",
+    {
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "version": "EnvironmentSection",
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "configuration": "EnvironmentSection",
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "environment-variables": "EnvironmentSection",
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "github-event-file": "EnvironmentSection",
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "github-event-object": "EnvironmentSection",
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "python-packages": "EnvironmentSection",
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "node-packages": "EnvironmentSection",
+        # | Environment section.
+        # |
+        # | The configuration of a c2cciutils-env section
+        "debian-packages": "EnvironmentSection",
+    },
+    total=False,
+)
+
+
 # | K3d configuration.
 # |
 # | default:
@@ -0,0 +1,106 @@
+# Copyright (c) 2020-2026, Camptocamp SA
+
+"""Minimal client of the Docker Engine API, over the unix socket."""
+
+import http.client
+import json
+import os
+import socket
+import struct
+import urllib.parse
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+_HEADER = struct.Struct(">BxxxL")
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix socket."""
+
+    def __init__(self, socket_path: str, timeout: float | None = None) -> None:
+        """Construct."""
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        """Connect to the unix socket."""
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _current_context() -> str:
+    """Get the current docker context name, without running the docker command."""
+    if "DOCKER_CONTEXT" in os.environ:
+        return os.environ["DOCKER_CONTEXT"]
+    config_path = Path(os.environ.get("DOCKER_CONFIG", Path.home() / ".docker")) / "config.json"
+    try:
+        with config_path.open(encoding="utf-8") as config_file:
+            return str(json.load(config_file).get("currentContext") or "default")
+    except (OSError, ValueError):
+        return "default"
+
+
+def socket_path() -> str | None:
+    """
+    Get the path of the Docker Engine socket, None if it's not available.
+
+    As for the docker command, `DOCKER_HOST` has the priority over the context, and with another context
+    than the default one the socket isn't used, to get the same daemon as the docker command.
+    """
+    if "DOCKER_HOST" not in os.environ and _current_context() != "default":
+        return None
+    docker_host = os.environ.get("DOCKER_HOST", "unix:///var/run/docker.sock")
+    if not docker_host.startswith("unix://"):
+        return None
+    path = docker_host[len("unix://") :]
+    return path if Path(path).is_socket() else None
+
+
+class Client:
+    """
+    Client of the Docker Engine API.
+
+    All the requests are done on one persistent connection, then a client shouldn't be shared between
+    threads.
+    """
+
+    def __init__(self, path: str, timeout: float | None = None) -> None:
+        """Construct."""
+        self.connection = _UnixHTTPConnection(path, timeout)
+
+    def _get(self, path: str, **params: str) -> http.client.HTTPResponse:
+        """Do a GET request, the response should be completely read before the next request."""
+        self.connection.request("GET", f"{path}?{urllib.parse.urlencode(params)}" if params else path)
+        response = self.connection.getresponse()
+        if response.status >= 400:
+            message = f"Docker Engine API error on {path}: {response.status} {response.read().decode()}"
+            raise RuntimeError(message)
+        return response
+
+    def get_json(self, path: str, **params: str) -> Any:
+        """Get a JSON result."""
+        return json.loads(self._get(path, **params).read())
+
+    def containers(self) -> list[Any]:
+        """Get all the containers, like `docker ps --all`."""
+        return self.get_json("/containers/json", all="true")  # type: ignore[no-any-return]
+
+    def logs(self, container_id: str, **params: str) -> Iterator[tuple[int, bytes]]:
+        """
+        Get the logs of a container, like `docker logs`.
+
+        Yield the stream type (1 for the standard output, 2 for the error output) and the content,
+        in the order they are emitted.
+        """
+        tty = self.get_json(f"/containers/{container_id}/json")["Config"]["Tty"]
+        response = self._get(f"/containers/{container_id}/logs", stdout="true", stderr="true", **params)
+        if tty:
+            # Not multiplexed
+            while chunk := response.read(65536):
+                yield 1, chunk
+            return
+        while header := response.read(_HEADER.size):
+            stream, size = _HEADER.unpack(header)
+            yield stream, response.read(size)
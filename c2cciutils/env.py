@@ -1,27 +1,35 @@
 # Copyright (c) 2020-2026, Camptocamp SA
 
+import concurrent.futures
+import functools
+import io
 import json
 import os
 import subprocess  # nosec
 import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
 from pathlib import Path
+from typing import Any, TextIO, cast
 
 import ruamel.yaml
-import yaml
 
+import c2cciutils
 import c2cciutils.configuration
 
 
 class PrintVersions:
     """Print some tools versions."""
 
-    def __init__(self, config: c2cciutils.configuration.PrintVersions) -> None:
+    def __init__(self, config: c2cciutils.configuration.PrintVersions, timeout: float | None = None) -> None:
         """Construct."""
         self.config = config
+        self.timeout = timeout
 
     def __call__(self) -> None:
         """Run."""
-        c2cciutils.print_versions(self.config)
+        c2cciutils.print_versions(self.config, self.timeout)
 
 
 class PrintConfig:
@@ -46,67 +54,245 @@ def print_environment_variables() -> None:
 
 
 def print_github_event_file() -> None:
-    """Print the GitHub event file."""
+    """Print the GitHub event file, copied by chunks, without decoding it."""
     if "GITHUB_EVENT_PATH" in os.environ:
-        with Path(os.environ["GITHUB_EVENT_PATH"]).open(encoding="utf-8") as event:
-            print(event.read())
+        with Path(os.environ["GITHUB_EVENT_PATH"]).open("rb") as event:
+            sys.stdout.flush()
+            chunk = b""
+            while next_chunk := event.read(65536):
+                chunk = next_chunk
+                sys.stdout.buffer.write(chunk)
+        if not chunk.endswith(b"\n"):
+            print()
+
+
+def _match_keys(path: tuple[str, ...], keys: list[tuple[str, ...]] | None) -> bool:
+    """Check if the value at the path should be printed, a parent or a child of a selected key."""
+    return keys is None or any(path[: len(key)] == key[: len(path)] for key in keys)
+
+
+def _yaml_lines(
+    value: Any,
+    keys: list[tuple[str, ...]] | None = None,
+    path: tuple[str, ...] = (),
+    indent: str = "",
+) -> Iterator[str]:
+    """
+    Get the YAML representation of a JSON value, line by line.
+
+    The JSON strings are also valid YAML scalars, then they are kept as is.
+    Only the keys that match the dotted keys filter are printed.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if not _match_keys((*path, key), keys):
+                continue
+            if isinstance(item, dict | list) and item:
+                yield f"{indent}{json.dumps(key, ensure_ascii=False)}:"
+                yield from _yaml_lines(item, keys, (*path, key), f"{indent}  ")
+            else:
+                yield f"{indent}{json.dumps(key, ensure_ascii=False)}: {json.dumps(item, ensure_ascii=False)}"
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict | list) and item:
+                lines = _yaml_lines(item, keys, path, f"{indent}  ")
+                first = next(lines, None)
+                if first is not None:
+                    yield f"{indent}- {first.lstrip()}"
+                    yield from lines
+            else:
+                yield f"{indent}- {json.dumps(item, ensure_ascii=False)}"
+    else:
+        yield f"{indent}{json.dumps(value, ensure_ascii=False)}"
+
+
+def print_github_event_object(keys: list[str] | None = None) -> None:
+    """
+    Print the GitHub event object, as YAML.
+
+    Arguments:
+        keys: The keys to print, with dots for the sub keys, default: all
 
+    """
+    for line in _yaml_lines(
+        json.loads(os.environ["GITHUB_EVENT"]),
+        [tuple(key.split(".")) for key in keys] if keys is not None else None,
+    ):
+        print(line)
 
-def print_github_event_object() -> None:
-    """Print the GitHub event object."""
-    github_event = json.loads(os.environ["GITHUB_EVENT"])
-    print(yaml.dump(github_event, indent=2))
 
+def _print_command_output(cmd: list[str], timeout: float | None = None) -> None:
+    """Print the output (standard and error) of the command, through `sys.stdout`."""
+    print(c2cciutils.cached_command_output(cmd, check=False, timeout=timeout), end="")
 
-def print_python_package_version() -> None:
+
+def print_python_package_version(timeout: float | None = None) -> None:
     """Print the version of the Python packages."""
-    subprocess.run(["python3", "-m", "pip", "freeze", "--all"], check=False)  # pylint: disable=subprocess-run-check # noqa: S607
+    _print_command_output(["python3", "-m", "pip", "freeze", "--all"], timeout)
 
 
-def print_node_package_version() -> None:
+def print_node_package_version(timeout: float | None = None) -> None:
     """Print the version of the Python packages."""
-    subprocess.run(["npm", "list", "--global"], check=False)  # pylint: disable=subprocess-run-check # noqa: S607
+    _print_command_output(["npm", "list", "--global"], timeout)
 
 
-def print_debian_package_version() -> None:
+def print_debian_package_version(timeout: float | None = None) -> None:
     """Print the version of the Python packages."""
-    subprocess.run(["dpkg", "--list"], check=False)  # pylint: disable=subprocess-run-check # noqa: S607
+    _print_command_output(["dpkg", "--list"], timeout)
+
+
+class _ThreadOutput(io.TextIOBase):
+    """Output stream that writes in the buffer of the current thread, if any, else in the wrapped stream."""
+
+    def __init__(self, stream: TextIO) -> None:
+        """Construct."""
+        self.stream = stream
+        self.local = threading.local()
+
+    def _current(self) -> TextIO:
+        return cast("TextIO", getattr(self.local, "output", self.stream))
+
+    @property
+    def buffer(self) -> io.BufferedIOBase:  # type: ignore[override]
+        """Get the binary buffer."""
+        return cast("io.BufferedIOBase", self._current().buffer)
+
+    def write(self, text: str) -> int:  # type: ignore[override]
+        """Write the text."""
+        return self._current().write(text)
+
+    def flush(self) -> None:
+        """Flush the stream."""
+        self._current().flush()
+
+    def capture(self, function: Callable[[], None]) -> bytes:
+        """Run the function and get what it prints."""
+        buffer = io.BytesIO()
+        self.local.output = io.TextIOWrapper(buffer, encoding="utf-8", write_through=True)
+        try:
+            try:
+                function()
+            except subprocess.CalledProcessError as error:
+                print(f"::error::Error: {error}")
+                print("::endgroup::")
+            except subprocess.TimeoutExpired as error:
+                c2cciutils.error("env", f"Killed: {error}", error_type="warning")
+            return buffer.getvalue()
+        finally:
+            del self.local.output
+
+    def start(self, function: Callable[[], None]) -> "concurrent.futures.Future[bytes]":
+        """
+        Run the function in a daemon thread, and get the future of what it prints.
+
+        A daemon thread isn't joined at the interpreter exit, then a section that overruns its budget
+        doesn't delay the exit.
+        """
+        future: concurrent.futures.Future[bytes] = concurrent.futures.Future()
+
+        def run() -> None:
+            try:
+                future.set_result(self.capture(function))
+            except BaseException as exception:  # noqa: BLE001
+                future.set_exception(exception)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
 
 
 def print_environment(config: c2cciutils.configuration.Configuration, prefix: str = "Print ") -> None:
-    """Print the GitHub environment information."""
-    functions = [
+    """
+    Print the GitHub environment information.
+
+    Each section can be disabled, and has a time budget, see the `env` configuration.
+    """
+    sections_config = config.get("env", {}).get("sections", {})
+
+    def timeout(key: str) -> float:
+        return sections_config.get(key, {}).get(  # type: ignore[attr-defined,no-any-return]
+            "timeout",
+            c2cciutils.configuration.ENVIRONMENT_SECTION_TIMEOUT_DEFAULT,
+        )
+
+    functions: list[tuple[str, str, Callable[[], None]]] = [
         (
             "version",
-            PrintVersions(config.get("print_versions", {})),
+            "version",
+            PrintVersions(config.get("print_versions", {}), timeout("version")),
         ),
-        ("configuration", PrintConfig(config)),
-        ("environment variables", print_environment_variables),
+        ("configuration", "configuration", PrintConfig(config)),
+        ("environment-variables", "environment variables", print_environment_variables),
     ]
     if "GITHUB_EVENT_PATH" in os.environ:
-        functions.append(("GitHub event file", print_github_event_file))
+        functions.append(("github-event-file", "GitHub event file", print_github_event_file))
     if "GITHUB_EVENT" in os.environ:
-        functions.append(("GitHub event object", print_github_event_object))
+        functions.append(
+            (
+                "github-event-object",
+                "GitHub event object",
+                functools.partial(print_github_event_object, config.get("env", {}).get("github_event_keys")),
+            ),
+        )
 
     functions.extend(
         [
-            ("Python package versions", print_python_package_version),
-            ("Node package versions", print_node_package_version),
-            ("Debian package versions", print_debian_package_version),
+            (
+                "python-packages",
+                "Python package versions",
+                functools.partial(print_python_package_version, timeout("python-packages")),
+            ),
+            (
+                "node-packages",
+                "Node package versions",
+                functools.partial(print_node_package_version, timeout("node-packages")),
+            ),
+            (
+                "debian-packages",
+                "Debian package versions",
+                functools.partial(print_debian_package_version, timeout("debian-packages")),
+            ),
         ],
     )
+    functions = [
+        function
+        for function in functions
+        if sections_config.get(function[0], {}).get(  # type: ignore[attr-defined]
+            "enabled",
+            c2cciutils.configuration.ENVIRONMENT_SECTION_ENABLED_DEFAULT,
+        )
+    ]
 
-    for name, function in functions:
-        if prefix:
-            print(f"::group::{prefix}{name}")
-        else:
-            print(f"::group::{name[0].upper()}{name[1:]}")
-        try:
-            sys.stdout.flush()
-            sys.stderr.flush()
-            function()  # type: ignore[operator]
-        except subprocess.CalledProcessError as error:
-            print(f"::error::Error: {error}")
-            print("::endgroup::")
-        finally:
-            print("::endgroup::")
+    # The sections are run concurrently, and their outputs are printed in order, the streamed sections
+    # are run when their group is printed, to don't hold their whole output in memory
+    streamed = {"github-event-file"}
+    output = _ThreadOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        start = time.monotonic()
+        futures = [output.start(function) if key not in streamed else None for key, _, function in functions]
+        for (key, name, function), future in zip(functions, futures, strict=True):
+            if prefix:
+                print(f"::group::{prefix}{name}")
+            else:
+                print(f"::group::{name[0].upper()}{name[1:]}")
+            try:
+                if future is None:
+                    function()
+                else:
+                    # The commands are killed at the end of the budget, the small margin let them be
+                    # reported by the section itself, the Python sections are left running in their daemon
+                    # thread.
+                    result = future.result(timeout=max(start + timeout(key) + 1 - time.monotonic(), 0))
+                    sys.stdout.flush()
+                    sys.stdout.buffer.write(result)
+                    sys.stdout.buffer.flush()
+            except concurrent.futures.TimeoutError:
+                c2cciutils.error(
+                    "env",
+                    f"The section '{key}' didn't finish in {timeout(key)} seconds",
+                    error_type="warning",
+                )
+            finally:
+                print("::endgroup::")
+    finally:
+        sys.stdout = output.stream
@@ -2,23 +2,213 @@
 # Copyright (c) 2020-2026, Camptocamp SA
 
 import argparse
+import concurrent.futures
 import datetime
+import json
+import re
 import subprocess  # nosec
 import sys
+import threading
 from pathlib import Path
 
+import c2cciutils
+import c2cciutils.docker_engine
+
+# Store the timestamp (in nanoseconds) of the last log line read for each container ID,
+# to avoid printing the same logs multiple times.
+_CURSORS_FILE_PATH = Path("/tmp/docker-logs-cursors.json")  # noqa: S108 # nosec
+_TIMESTAMP_RE = re.compile(rb"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?Z ")
+_COMPOSE_LINE_RE = re.compile(rb"^(\S+)\s+\| (.*\n?)$", re.DOTALL)
+# One Docker Engine API client (then connection) per worker thread
+_LOCAL = threading.local()
+
 
 def _print(message: str) -> None:
     print(message)
     sys.stdout.flush()
 
 
+def _print_output(output: bytes) -> None:
+    sys.stdout.buffer.write(output)
+    if output and not output.endswith(b"\n"):
+        sys.stdout.buffer.write(b"\n")
+
+
+def _since(cursor: int) -> str:
+    """Get the `since` argument value to get the logs after the cursor."""
+    cursor += 1
+    return f"{cursor // 1_000_000_000}.{cursor % 1_000_000_000:09d}"
+
+
+def _parse_timestamp(date: bytes, fraction: bytes | None) -> int:
+    """Get the timestamp in nanoseconds, from the date and the fraction of second."""
+    seconds = datetime.datetime.fromisoformat(date.decode()).replace(tzinfo=datetime.UTC).timestamp()
+    return int(seconds) * 1_000_000_000 + int((fraction or b"").decode().ljust(9, "0")[:9])
+
+
+def _strip_timestamps(output: bytes, cursor: int | None) -> tuple[bytes, int | None]:
+    """
+    Remove the timestamps added by `docker logs --timestamps`, and the lines before the cursor.
+
+    Return the output and the timestamp of the last line, in nanoseconds.
+    """
+    start = cursor
+    lines = []
+    for line in output.splitlines(keepends=True):
+        match = _TIMESTAMP_RE.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+        timestamp = _parse_timestamp(*match.groups())
+        if start is not None and timestamp <= start:
+            continue
+        # The standard and error outputs are not ordered between them
+        cursor = timestamp if cursor is None else max(cursor, timestamp)
+        lines.append(line[match.end() :])
+    return b"".join(lines), cursor
+
+
+def _logs(container_id: str, cursor: int | None) -> tuple[bytes, int | None]:
+    """Get the logs (standard and error output) of a container after the cursor, and the new cursor."""
+    since_args = [f"--since={_since(cursor)}"] if cursor is not None else []
+    output = subprocess.run(  # noqa: S603,S607,RUF100
+        ["docker", "logs", "--timestamps", *since_args, container_id],  # noqa: S607
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        check=False,
+    ).stdout
+    return _strip_timestamps(output, cursor)
+
+
+def _engine_client(socket_path: str) -> c2cciutils.docker_engine.Client:
+    if not hasattr(_LOCAL, "client"):
+        _LOCAL.client = c2cciutils.docker_engine.Client(socket_path)
+    return _LOCAL.client  # type: ignore[no-any-return]
+
+
+def _engine_logs(socket_path: str, container_id: str, cursor: int | None) -> tuple[bytes, int | None]:
+    """
+    Get the logs of a container after the cursor, and the new cursor, with the Docker Engine API.
+
+    As with the docker command, an error (e.g. the container is removed) is printed as the logs, and the
+    cursor is kept.
+    """
+    since_params = {"since": _since(cursor)} if cursor is not None else {}
+    client = _engine_client(socket_path)
+    try:
+        output = b"".join(
+            content for _, content in client.logs(container_id, timestamps="true", **since_params)
+        )
+    except RuntimeError as exception:
+        return f"Error: {exception}\n".encode(), cursor
+    except OSError as exception:
+        # The connection is in an unknown state, a new one will be opened
+        del _LOCAL.client
+        return f"Error: {exception}\n".encode(), cursor
+    return _strip_timestamps(output, cursor)
+
+
+def _compose_prefixes(containers: list[tuple[str, str]]) -> dict[bytes, str]:
+    """Get the containers ID by the prefix used in the `docker compose logs` output."""
+    ids = {name: container_id for container_id, name in containers}
+    output = subprocess.run(  # noqa: S603,S607,RUF100
+        ["docker", "compose", "ps", "--all", "--format=json"],  # noqa: S607
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout.decode()
+    # Depending on the version we get a JSON array or one JSON object per line
+    compose_containers = (
+        json.loads(output)
+        if output.lstrip().startswith("[")
+        else [json.loads(line) for line in output.splitlines() if line.strip()]
+    )
+    prefixes = {}
+    for container in compose_containers:
+        if container["Name"] in ids:
+            for prefix in (container["Name"], container["Name"].removeprefix(f"{container['Project']}-")):
+                prefixes[prefix.encode()] = ids[container["Name"]]
+    return prefixes
+
+
+def _compose_logs(
+    prefixes: dict[bytes, str],
+    cursors: dict[str, int],
+) -> tuple[dict[str, tuple[bytes, int | None]], bytes]:
+    """
+    Get the logs of all the Docker Compose containers with one `docker compose logs` stream.
+
+    The stream is demultiplexed by container, return the logs and the new cursor of each container,
+    and the merged timeline of the selected containers, with the other lines of the output (messages of
+    the docker compose command).
+    """
+    ids = set(prefixes.values())
+    since_args = (
+        [f"--since={_since(min(cursors[container_id] for container_id in ids))}"]
+        if all(container_id in cursors for container_id in ids)
+        else []
+    )
+    lines: dict[str, list[bytes]] = {container_id: [] for container_id in ids}
+    new_cursors: dict[str, int | None] = {container_id: cursors.get(container_id) for container_id in ids}
+    timeline = []
+    with subprocess.Popen(  # noqa: S603,S607,RUF100
+        ["docker", "compose", "logs", "--timestamps", "--no-color", *since_args],  # noqa: S607
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    ) as process:
+        assert process.stdout is not None
+        for line in process.stdout:
+            match = _COMPOSE_LINE_RE.match(line)
+            if match is None:
+                timeline.append(line)
+            # Ignore the containers that are not selected
+            elif match.group(1) in prefixes:
+                container_id = prefixes[match.group(1)]
+                output, cursor = _strip_timestamps(match.group(2), cursors.get(container_id))
+                if output:
+                    lines[container_id].append(output)
+                    timeline.append(b"%s | %s" % (match.group(1), output))
+                if cursor is not None:
+                    new_cursors[container_id] = max(cursor, new_cursors[container_id] or cursor)
+    return {
+        container_id: (b"".join(lines[container_id]), new_cursors[container_id]) for container_id in ids
+    }, b"".join(timeline)
+
+
 def main() -> None:
     """Print the list of running docker containers and their logs formatted for GitHub CI."""
     parser = argparse.ArgumentParser(
         description=("Print the list of running docker containers and their logs formatted for GitHub CI."),
     )
-    parser.parse_args()
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=8,
+        help="Number of containers logs fetched concurrently (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["auto", "api", "cli"],
+        default="auto",
+        help="Get the containers and their logs with the Docker Engine API over the unix socket, "
+        "or with the docker command, auto uses the API if the socket is available (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--compose",
+        action="store_true",
+        help="Get the logs of the Docker Compose containers with one `docker compose logs` stream",
+    )
+    parser.add_argument(
+        "--timeline",
+        action="store_true",
+        help="With --compose, print the logs of the Docker Compose containers in one timeline, "
+        "instead of one group by container",
+    )
+    parser.add_argument("container", nargs="*", help="Print only the logs of these containers (names)")
+    args = parser.parse_args()
+
+    socket_path = c2cciutils.docker_engine.socket_path() if args.backend != "cli" else None
+    if args.backend == "api" and socket_path is None:
+        parser.error("The Docker Engine socket is not available")
 
     if Path("docker-compose.yaml").exists():
         _print("::group::Docker Compose ps")
@@ -29,29 +219,79 @@ def main() -> None:
     subprocess.run(["docker", "ps", "--all"], check=False)  # noqa: S607
     _print("::endgroup::")
 
-    # Store in /tmp/docker-logs-timestamp the current timestamp to avoid printing same logs multiple times.
-    timestamp_args = []
-    timestamp_file_path = Path("/tmp/docker-logs-timestamp")  # noqa: S108 # nosec
-    if timestamp_file_path.exists():  # nosec
-        with timestamp_file_path.open(encoding="utf-8") as timestamp_file:  # nosec
-            timestamp_args = [f"--since={timestamp_file.read().strip()}Z"]
-
-    with timestamp_file_path.open("w", encoding="utf-8") as timestamp_file:  # nosec
-        timestamp_file.write(datetime.datetime.now(tz=datetime.UTC).isoformat())
-
-    for name in (
-        subprocess.run(  # noqa: S603,S607,RUF100
-            ["docker", "ps", "--all", "--format", "{{ .Names }}"],  # noqa: S607
-            check=True,
-            stdout=subprocess.PIPE,
+    # A missing or corrupted file (e.g. concurrent jobs) is as if no logs were read
+    cursors = c2cciutils.read_cache(_CURSORS_FILE_PATH)
+    if not isinstance(cursors, dict):
+        cursors = {}
+
+    containers: list[tuple[str, str]] = []
+    if socket_path is not None:
+        try:
+            containers = [
+                (container["Id"], container["Names"][0].lstrip("/"))
+                for container in _engine_client(socket_path).containers()
+            ]
+        except (OSError, RuntimeError) as exception:
+            if args.backend == "api":
+                raise
+            # Permission denied, stale socket, API error, ...
+            _print(f"The Docker Engine API is not usable, use the docker command: {exception}")
+            socket_path = None
+    if socket_path is None:
+        for line in (
+            subprocess.run(  # noqa: S603,S607,RUF100
+                ["docker", "ps", "--all", "--no-trunc", "--format", "{{ .ID }} {{ .Names }}"],  # noqa: S607
+                check=True,
+                stdout=subprocess.PIPE,
+            )
+            .stdout.decode()
+            .split("\n")
+        ):
+            if line:
+                container_id, name = line.split(" ", 1)
+                containers.append((container_id, name))
+
+    # The removed containers are forgotten
+    new_cursors = {
+        container_id: cursors[container_id] for container_id, _ in containers if container_id in cursors
+    }
+    if args.container:
+        containers = [(container_id, name) for container_id, name in containers if name in args.container]
+    compose_prefixes = (
+        _compose_prefixes(containers) if args.compose and Path("docker-compose.yaml").exists() else {}
+    )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        # The logs are fetched concurrently, and printed in a stable order
+        compose_future = (
+            executor.submit(_compose_logs, compose_prefixes, cursors) if compose_prefixes else None
         )
-        .stdout.decode()
-        .split("\n")
-    ):
-        if name:
-            _print(f"::group::{name}: New logs")
-            subprocess.run(["docker", "logs", *timestamp_args, name], check=False)  # noqa: S603,S607
+        futures = {
+            container_id: (
+                executor.submit(_logs, container_id, cursors.get(container_id))
+                if socket_path is None
+                else executor.submit(_engine_logs, socket_path, container_id, cursors.get(container_id))
+            )
+            for container_id, _ in containers
+            if container_id not in compose_prefixes.values()
+        }
+        compose_logs, compose_timeline = compose_future.result() if compose_future is not None else ({}, b"")
+        if args.timeline and compose_timeline:
+            # All the services in one timeline, as received from docker compose
+            _print("::group::Docker Compose logs")
+            _print_output(compose_timeline)
             _print("::endgroup::")
+        for container_id, name in containers:
+            output, cursor = (
+                compose_logs[container_id] if container_id in compose_logs else futures[container_id].result()
+            )
+            if not (args.timeline and container_id in compose_logs):
+                _print(f"::group::{name}: New logs")
+                _print_output(output)
+                _print("::endgroup::")
+            if cursor is not None:
+                new_cursors[container_id] = cursor
+
+    c2cciutils.write_cache(_CURSORS_FILE_PATH, new_cursors)
 
 
 if __name__ == "__main__":
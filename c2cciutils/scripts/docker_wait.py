@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Copyright (c) 2020-2026, Camptocamp SA
+
+import argparse
+import json
+import queue
+import subprocess  # nosec
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any
+
+import c2cciutils
+
+
+def _print(message: str) -> None:
+    print(message)
+    sys.stdout.flush()
+
+
+def _read_events(stream: IO[bytes], events: "queue.Queue[Any]") -> None:
+    try:
+        for line in stream:
+            events.put(json.loads(line))
+    finally:
+        # The end of the events stream
+        events.put(None)
+
+
+def _get_containers_ids(names: list[str]) -> list[str]:
+    """Get the selected containers, by default the Docker Compose project ones, or the running ones."""
+    if names:
+        command = ["docker", "inspect", "--format={{ .Id }}", *names]
+    elif Path("docker-compose.yaml").exists():
+        command = ["docker", "compose", "ps", "--all", "--quiet"]
+    else:
+        command = ["docker", "ps", "--quiet", "--no-trunc"]
+    return subprocess.run(command, check=True, stdout=subprocess.PIPE).stdout.decode().split()  # noqa: S603
+
+
+def _has_healthcheck(container: Any) -> bool:
+    """Check if a container has a health check, from its inspect result (with the image one)."""
+    healthcheck = container["Config"].get("Healthcheck") or {}
+    return bool(healthcheck.get("Test")) and healthcheck["Test"] != ["NONE"]
+
+
+def _initial_state(container: Any) -> str:
+    """
+    Get the state of a container from its inspect result.
+
+    The states are `ready`, `waiting` and `failed`.
+    """
+    state = container["State"]
+    if state.get("OOMKilled"):
+        return "failed"
+    if state["Status"] == "exited":
+        return "ready" if state["ExitCode"] == 0 else "failed"
+    if state["Status"] != "running":
+        return "waiting"
+    if "Health" in state:
+        return "ready" if state["Health"]["Status"] == "healthy" else "waiting"
+    return "ready"
+
+
+def _event_state(event: Any, has_healthcheck: bool) -> str | None:
+    """Get the new state of a container from an event, None if the state didn't change."""
+    action = event["Action"]
+    if action == "start":
+        # Without health check, a started container is ready
+        return "waiting" if has_healthcheck else "ready"
+    if action == "oom":
+        return "failed"
+    if action == "die":
+        return "ready" if event["Actor"]["Attributes"].get("exitCode") == "0" else "failed"
+    if action.startswith("health_status"):
+        return "ready" if action.endswith(": healthy") else "waiting"
+    return None
+
+
+def main() -> None:
+    """Wait that the docker containers are healthy, driven by the docker events."""
+    parser = argparse.ArgumentParser(
+        description="Wait that the docker containers are healthy (or running if they don't have any "
+        "health check), fail as soon as a container dies or is out of memory.",
+    )
+    parser.add_argument("--timeout", default=200, type=int, help="Timeout in seconds (default: %(default)s)")
+    parser.add_argument(
+        "container",
+        nargs="*",
+        help="The containers to wait for, default: the Docker Compose containers if there is a "
+        "`docker-compose.yaml` file, else the running containers",
+    )
+    args = parser.parse_args()
+
+    deadline = time.monotonic() + args.timeout
+    # Subscribe to the events before getting the state to don't miss any change
+    with subprocess.Popen(  # noqa: S603,S607,RUF100
+        [  # noqa: S607
+            "docker",
+            "events",
+            "--format={{ json . }}",
+            "--filter=type=container",
+            "--filter=event=start",
+            "--filter=event=health_status",
+            "--filter=event=die",
+            "--filter=event=oom",
+        ],
+        stdout=subprocess.PIPE,
+    ) as events_process:
+        try:
+            assert events_process.stdout is not None
+            events: queue.Queue[Any] = queue.Queue()
+            threading.Thread(target=_read_events, args=(events_process.stdout, events), daemon=True).start()
+
+            ids = _get_containers_ids(args.container)
+            containers = (
+                json.loads(
+                    subprocess.run(  # noqa: S603,S607,RUF100
+                        ["docker", "inspect", *ids],  # noqa: S607
+                        check=True,
+                        stdout=subprocess.PIPE,
+                    ).stdout,
+                )
+                if ids
+                else []
+            )
+            names = {container["Id"]: container["Name"].lstrip("/") for container in containers}
+            states = {container["Id"]: _initial_state(container) for container in containers}
+            healthchecks = {container["Id"]: _has_healthcheck(container) for container in containers}
+
+            while "failed" not in states.values() and "waiting" in states.values():
+                try:
+                    event = events.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if event is None:
+                    c2cciutils.error("docker-wait", "The docker events stream stopped")
+                    break
+                container_id = event["Actor"]["ID"]
+                if container_id not in states:
+                    continue
+                state = _event_state(event, healthchecks[container_id])
+                if state is not None:
+                    states[container_id] = state
+                    _print(f"{names[container_id]}: {event['Action']}")
+        finally:
+            events_process.terminate()
+
+    not_ready = [names[container_id] for container_id, state in states.items() if state != "ready"]
+    if not not_ready:
+        _print("Containers ready:")
+        _print("\n".join(names.values()))
+        sys.exit(0)
+
+    for container_id, state in states.items():
+        if state == "failed":
+            c2cciutils.error("docker-wait", f"The container {names[container_id]} failed")
+        elif state == "waiting":
+            c2cciutils.error("docker-wait", f"The container {names[container_id]} is not ready")
+    subprocess.run(["c2cciutils-docker-logs", *not_ready], check=False)  # noqa: S603,S607
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,22 @@
 # Copyright (c) 2020-2026, Camptocamp SA
 
 import argparse
+import concurrent.futures
+import datetime
+import functools
+import json
+import re
 import subprocess  # nosec
 import sys
+from pathlib import Path
+from typing import Any
+
+import c2cciutils
+
+# Store the timestamp of the last log line read for each container, to avoid printing the same logs
+# multiple times.
+_TIMESTAMPS_FILE_PATH = Path("/tmp/k8s-logs-timestamps.json")  # noqa: S108 # nosec
+_TIMESTAMP_RE = re.compile(rb"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?Z ")
 
 
 def _print(message: str) -> None:
@@ -11,10 +25,193 @@ def _print(message: str) -> None:
     sys.stdout.flush()
 
 
+def _describe(name: str) -> tuple[bytes, str | None]:
+    """Get the description of the resource (standard and error output), without cursor."""
+    return (
+        subprocess.run(  # noqa: S603,S607,RUF100
+            ["kubectl", "describe", name],  # noqa: S607
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=False,
+        ).stdout,
+        None,
+    )
+
+
+def _parse_timestamp(date: bytes, fraction: bytes | None) -> int:
+    """Get the timestamp in nanoseconds, from the date and the fraction of second."""
+    seconds = datetime.datetime.fromisoformat(date.decode()).replace(tzinfo=datetime.UTC).timestamp()
+    return int(seconds) * 1_000_000_000 + int((fraction or b"").decode().ljust(9, "0")[:9])
+
+
+def _strip_timestamps(output: bytes, cursor: str | None) -> tuple[bytes, str | None]:
+    """
+    Remove the timestamps added by `kubectl logs --timestamps`, and the lines before the cursor.
+
+    The `--since-time` is truncated to the second by the API server, then the lines at or before the
+    cursor are removed here.
+
+    Return the output and the timestamp of the last line.
+    """
+    cursor_match = _TIMESTAMP_RE.match(f"{cursor} ".encode()) if cursor is not None else None
+    start = _parse_timestamp(*cursor_match.groups()) if cursor_match is not None else None
+    lines = []
+    for line in output.splitlines(keepends=True):
+        match = _TIMESTAMP_RE.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+        if start is not None and _parse_timestamp(*match.groups()) <= start:
+            continue
+        cursor = match.group(0).decode().rstrip()
+        lines.append(line[match.end() :])
+    return b"".join(lines), cursor
+
+
+def _logs(command: list[str], cursor: str | None) -> tuple[bytes, str | None]:
+    """Get the logs after the cursor, and the new cursor, unchanged if the command fails."""
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)  # noqa: S603
+    output, new_cursor = _strip_timestamps(process.stdout, cursor)
+    return output, new_cursor if process.returncode == 0 else cursor
+
+
+def _print_output(output: bytes) -> None:
+    sys.stdout.buffer.write(output)
+    if output and not output.endswith(b"\n"):
+        sys.stdout.buffer.write(b"\n")
+
+
+def _terminated_reason(terminated: Any) -> str:
+    """Get the reason of a terminated container, like in the `kubectl get pods` output."""
+    if terminated.get("reason"):
+        return str(terminated["reason"])
+    if terminated.get("signal"):
+        return f"Signal:{terminated['signal']}"
+    return f"ExitCode:{terminated.get('exitCode', 0)}"
+
+
+def _pod_status(pod: Any) -> str:
+    """Get the status of the pod, like in the `kubectl get pods` output."""
+    status = pod["status"].get("reason") or pod["status"].get("phase", "Unknown")
+    initializing = False
+    init_container_statuses = pod["status"].get("initContainerStatuses", [])
+    sidecars = {
+        container["name"]
+        for container in pod["spec"].get("initContainers", [])
+        if container.get("restartPolicy") == "Always"
+    }
+    # The first init container that isn't completed (or a started sidecar) gives the status
+    for index, container_status in enumerate(init_container_statuses):
+        state = container_status.get("state", {})
+        if state.get("terminated", {}).get("exitCode") == 0 or (
+            container_status["name"] in sidecars and container_status.get("started")
+        ):
+            continue
+        initializing = True
+        if "terminated" in state:
+            status = f"Init:{_terminated_reason(state['terminated'])}"
+        elif state.get("waiting", {}).get("reason") not in (None, "", "PodInitializing"):
+            status = f"Init:{state['waiting']['reason']}"
+        else:
+            status = f"Init:{index}/{len(pod['spec'].get('initContainers', init_container_statuses))}"
+        break
+    conditions = {condition["type"]: condition["status"] for condition in pod["status"].get("conditions", [])}
+    if not initializing or conditions.get("Initialized") == "True":
+        has_running = False
+        # The first container with a reason gives the status
+        for container_status in reversed(pod["status"].get("containerStatuses", [])):
+            state = container_status.get("state", {})
+            if state.get("waiting", {}).get("reason"):
+                status = state["waiting"]["reason"]
+            elif "terminated" in state:
+                status = _terminated_reason(state["terminated"])
+            elif container_status.get("ready") and "running" in state:
+                has_running = True
+        if status == "Completed" and has_running:
+            status = "Running" if conditions.get("Ready") == "True" else "NotReady"
+    if pod["metadata"].get("deletionTimestamp"):
+        if pod["status"].get("reason") == "NodeLost":
+            return "Unknown"
+        if pod["status"].get("phase") not in ("Succeeded", "Failed"):
+            return "Terminating"
+    return str(status)
+
+
+def _is_healthy(pod: Any) -> bool:
+    """Check that the pod is ready (or succeeded) and that no container restarted."""
+    if any(
+        status.get("restartCount", 0)
+        for status in [
+            *pod["status"].get("initContainerStatuses", []),
+            *pod["status"].get("containerStatuses", []),
+        ]
+    ):
+        return False
+    if pod["status"].get("phase") == "Succeeded":
+        return True
+    return pod["status"].get("phase") == "Running" and any(
+        condition["type"] == "Ready" and condition["status"] == "True"
+        for condition in pod["status"].get("conditions", [])
+    )
+
+
+def _age(timestamp: str) -> str:
+    seconds = int(
+        (datetime.datetime.now(tz=datetime.UTC) - datetime.datetime.fromisoformat(timestamp)).total_seconds(),
+    )
+    for unit, unit_seconds in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= unit_seconds:
+            return f"{seconds // unit_seconds}{unit}"
+    return f"{seconds}s"
+
+
+def _print_pods(pods: list[Any]) -> None:
+    """Print the pods table, like `kubectl get pods --output=wide`."""
+    rows = [["NAME", "READY", "STATUS", "RESTARTS", "AGE", "IP", "NODE"]]
+    for pod in pods:
+        container_statuses = pod["status"].get("containerStatuses", [])
+        ready = sum(1 for status in container_statuses if status.get("ready"))
+        rows.append(
+            [
+                pod["metadata"]["name"],
+                f"{ready}/{len(pod['spec'].get('containers', []))}",
+                _pod_status(pod),
+                str(sum(status.get("restartCount", 0) for status in container_statuses)),
+                _age(pod["metadata"]["creationTimestamp"]),
+                pod["status"].get("podIP", "<none>"),
+                pod["spec"].get("nodeName", "<none>"),
+            ],
+        )
+    widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+    for row in rows:
+        print("   ".join(value.ljust(width) for value, width in zip(row, widths, strict=True)).rstrip())
+
+
 def main() -> None:
     """Get some logs to from k8s."""
     parser = argparse.ArgumentParser(description="Get some logs to from k8s.")
     parser.add_argument("--namespace", help="Namespace to be used")
+    parser.add_argument(
+        "--tail",
+        type=int,
+        help="Number of lines of logs to get for the healthy pods, the logs of the other pods are complete",
+    )
+    parser.add_argument(
+        "--limit-bytes",
+        type=int,
+        help="Maximum bytes of logs to get for the healthy pods, the logs of the other pods are complete",
+    )
+    parser.add_argument(
+        "--previous",
+        action="store_true",
+        help="Also get the logs of the previous instance of the restarted containers",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=8,
+        help="Number of kubectl commands run concurrently (default: %(default)s)",
+    )
 
     args = parser.parse_args()
 
@@ -30,46 +227,92 @@ def main() -> None:
         subprocess.run(["kubectl", "get", "deployments", "--output=wide"], check=False)  # noqa: S607
         _print("::endgroup::")
 
+        # All the pods information are derived from this list
+        pods = json.loads(
+            subprocess.run(  # noqa: S607,RUF100
+                ["kubectl", "get", "pods", "--output=json"],  # noqa: S607
+                check=True,
+                stdout=subprocess.PIPE,
+            ).stdout,
+        )["items"]
+
         _print("::group::Pods")
-        subprocess.run(["kubectl", "get", "pods", "--output=wide"], check=False)  # noqa: S607
+        _print_pods(pods)
         _print("::endgroup::")
 
-        for name in (
-            subprocess.run(["kubectl", "get", "pods", "--output=name"], check=True, stdout=subprocess.PIPE)  # noqa: S607
-            .stdout.decode()
-            .split("\n")
-        ):
-            if name:
-                _print(f"::group::{name}: Describe")
-                subprocess.run(["kubectl", "describe", name], check=False)  # noqa: S603,S607
-                _print("::endgroup::")
+        limit_args = []
+        if args.tail is not None:
+            limit_args.append(f"--tail={args.tail}")
+        if args.limit_bytes is not None:
+            limit_args.append(f"--limit-bytes={args.limit_bytes}")
 
-                for container in (
-                    subprocess.run(  # noqa: S603,S607,RUF100
-                        ["kubectl", "get", name, "--output=jsonpath={.spec.initContainers[*].name}"],  # noqa: S607
-                        check=True,
-                        stdout=subprocess.PIPE,
-                    )
-                    .stdout.decode()
-                    .split()
-                ):
-                    if name:
-                        _print(f"::group::{name} {container}: Logs")
-                        subprocess.run(["kubectl", "logs", name, container], check=False)  # noqa: S603,S607
-                        _print("::endgroup::")
-
-                for container in (
-                    subprocess.run(  # noqa: S603,S607,RUF100
-                        ["kubectl", "get", name, "--output=jsonpath={.spec.containers[*].name}"],  # noqa: S607
-                        check=True,
-                        stdout=subprocess.PIPE,
+        # A missing or corrupted file (e.g. concurrent jobs) is as if no logs were read
+        timestamps = c2cciutils.read_cache(_TIMESTAMPS_FILE_PATH)
+        if not isinstance(timestamps, dict):
+            timestamps = {}
+        new_timestamps: dict[str, str] = {}
+
+        # The title, the function that gets the output and the cursor, and for the logs the key of the
+        # container cursor to update
+        groups: list[tuple[str, functools.partial[tuple[bytes, str | None]], str | None]] = []
+        for pod in pods:
+            name = f"pod/{pod['metadata']['name']}"
+            # Get the complete logs only for the pods that have a problem
+            logs_args = limit_args if _is_healthy(pod) else []
+            restarted = {
+                status["name"]
+                for status in [
+                    *pod["status"].get("initContainerStatuses", []),
+                    *pod["status"].get("containerStatuses", []),
+                ]
+                if status.get("restartCount", 0)
+            }
+            groups.append((f"{name}: Describe", functools.partial(_describe, name), None))
+            for container in [*pod["spec"].get("initContainers", []), *pod["spec"].get("containers", [])]:
+                key = f"{name} {container['name']}"
+                cursor = timestamps.get(key)
+                if cursor is not None:
+                    new_timestamps[key] = cursor
+                since_args = [f"--since-time={cursor}"] if cursor is not None else []
+                logs_command = ["kubectl", "logs", "--timestamps", *since_args]
+                if args.previous and container["name"] in restarted:
+                    groups.append(
+                        (
+                            f"{key}: Previous logs",
+                            functools.partial(
+                                _logs,
+                                [*logs_command, "--previous", name, container["name"]],
+                                cursor,
+                            ),
+                            None,
+                        ),
                     )
-                    .stdout.decode()
-                    .split()
-                ):
-                    _print(f"::group::{name} {container}: Logs")
-                    subprocess.run(["kubectl", "logs", name, container], check=False)  # noqa: S603,S607
-                    _print("::endgroup::")
+                title = "Last logs" if logs_args else "New logs" if since_args else "Logs"
+                groups.append(
+                    (
+                        f"{key}: {title}",
+                        functools.partial(
+                            _logs,
+                            [*logs_command, *logs_args, name, container["name"]],
+                            cursor,
+                        ),
+                        key,
+                    ),
+                )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            # The outputs are fetched concurrently, and printed in a deterministic order
+            futures = [executor.submit(function) for _, function, _ in groups]
+            for (title, _, cursor_key), future in zip(groups, futures, strict=True):
+                output, last_timestamp = future.result()
+                _print(f"::group::{title}")
+                _print_output(output)
+                _print("::endgroup::")
+                if cursor_key is not None and last_timestamp is not None:
+                    new_timestamps[cursor_key] = last_timestamp
+
+        # Written after the logs are read, to store the timestamp of the last line actually read
+        c2cciutils.write_cache(_TIMESTAMPS_FILE_PATH, new_timestamps)
     except subprocess.CalledProcessError as exception:
         # No exit error
         print(exception)
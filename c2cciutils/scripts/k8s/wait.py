@@ -2,13 +2,73 @@
 # Copyright (c) 2020-2026, Camptocamp SA
 
 import argparse
+import concurrent.futures
+import contextlib
+import io
 import json
+import queue
 import subprocess  # nosec
 import sys
+import threading
 import time
-from typing import Any
+import urllib.parse
+from collections.abc import Callable, Iterator
+from typing import Any, NamedTuple, cast
 
+import c2cciutils
 
+
+class _Workload(NamedTuple):
+    """The description of a kind of resources that we wait for."""
+
+    kind: str
+    api_path: str
+    check: Callable[[Any], bool]
+    # The fields used by the check, with a flag that tells if the value is printed as JSON by kubectl
+    fields: tuple[tuple[str, bool], ...]
+
+
+# The checkers by resource name, the pods should be the last one
+_WORKLOADS: dict[str, _Workload] = {}
+_BASE_PROJECTION = (
+    ("kind", False),
+    ("metadata.name", False),
+)
+# The waiting reasons of a container that will not recover by waiting
+_TERMINAL_REASONS = [
+    "ErrImagePull",
+    "ImagePullBackOff",
+    "InvalidImageName",
+    "CreateContainerConfigError",
+    "CrashLoopBackOff",
+]
+
+
+def _register(
+    resource: str,
+    kind: str,
+    api_path: str,
+    fields: tuple[tuple[str, bool], ...],
+) -> Callable[[Callable[[Any], bool]], Callable[[Any], bool]]:
+    """Register a readiness checker for a kind of resources."""
+
+    def decorator(check: Callable[[Any], bool]) -> Callable[[Any], bool]:
+        _WORKLOADS[resource] = _Workload(kind, api_path, check, fields)
+        return check
+
+    return decorator
+
+
+@_register(
+    "deployments",
+    "Deployment",
+    "/apis/apps/v1/namespaces/{namespace}/deployments",
+    (
+        ("status.observedGeneration", True),
+        ("status.conditions", True),
+        ("status.unavailableReplicas", True),
+    ),
+)
 def _check_deployment_status(deployments: Any) -> bool:
     for deployment in deployments["items"]:
         if not deployment["status"]:
@@ -36,6 +96,114 @@ def _check_deployment_status(deployments: Any) -> bool:
     return True
 
 
+def _check_generation(kind: str, workload: Any) -> bool:
+    if workload["status"].get("observedGeneration", 0) < workload["metadata"].get("generation", 0):
+        print(f"Waiting status for {kind} {workload['metadata']['name']}")
+        return False
+    return True
+
+
+def _print_not_ready(kind: str, workload: Any, message: str) -> None:
+    print(f"::group::{kind} {workload['metadata']['name']} not ready: {message}")
+    print(json.dumps(workload["status"], indent=4))
+    print("::endgroup::")
+
+
+@_register(
+    "statefulsets",
+    "StatefulSet",
+    "/apis/apps/v1/namespaces/{namespace}/statefulsets",
+    (
+        ("metadata.generation", True),
+        ("spec.replicas", True),
+        ("spec.updateStrategy", True),
+        ("status.observedGeneration", True),
+        ("status.readyReplicas", True),
+        ("status.updatedReplicas", True),
+    ),
+)
+def _check_statefulset_status(statefulsets: Any) -> bool:
+    for statefulset in statefulsets["items"]:
+        if not _check_generation("StatefulSet", statefulset):
+            return False
+        replicas = statefulset["spec"].get("replicas", 1)
+        ready_replicas = statefulset["status"].get("readyReplicas", 0)
+        if ready_replicas < replicas:
+            _print_not_ready("StatefulSet", statefulset, f"{ready_replicas}/{replicas} ready replicas")
+            return False
+        updated_replicas = statefulset["status"].get("updatedReplicas", 0)
+        if (
+            statefulset["spec"].get("updateStrategy", {}).get("type") != "OnDelete"
+            and updated_replicas < replicas
+        ):
+            _print_not_ready("StatefulSet", statefulset, f"{updated_replicas}/{replicas} updated replicas")
+            return False
+
+    return True
+
+
+@_register(
+    "daemonsets",
+    "DaemonSet",
+    "/apis/apps/v1/namespaces/{namespace}/daemonsets",
+    (
+        ("metadata.generation", True),
+        ("status.observedGeneration", True),
+        ("status.desiredNumberScheduled", True),
+        ("status.updatedNumberScheduled", True),
+        ("status.numberAvailable", True),
+    ),
+)
+def _check_daemonset_status(daemonsets: Any) -> bool:
+    for daemonset in daemonsets["items"]:
+        if not _check_generation("DaemonSet", daemonset):
+            return False
+        desired = daemonset["status"].get("desiredNumberScheduled", 0)
+        for field in ("updatedNumberScheduled", "numberAvailable"):
+            number = daemonset["status"].get(field, 0)
+            if number < desired:
+                _print_not_ready("DaemonSet", daemonset, f"{number}/{desired} {field}")
+                return False
+
+    return True
+
+
+def _job_condition(job: Any, condition_type: str) -> Any:
+    for condition in job["status"].get("conditions", []):
+        if condition["type"] == condition_type and condition["status"] == "True":
+            return condition
+    return None
+
+
+@_register(
+    "jobs",
+    "Job",
+    "/apis/batch/v1/namespaces/{namespace}/jobs",
+    (
+        ("spec.completions", True),
+        ("status.conditions", True),
+        ("status.succeeded", True),
+        ("status.failed", True),
+    ),
+)
+def _check_job_status(jobs: Any) -> bool:
+    for job in jobs["items"]:
+        if _job_condition(job, "Complete") is not None:
+            continue
+        failed = _job_condition(job, "Failed")
+        if failed is not None:
+            _print_not_ready("Job", job, f"failed: {failed.get('message', failed.get('reason', ''))}")
+            return False
+        _print_not_ready(
+            "Job",
+            job,
+            f"{job['status'].get('succeeded', 0)}/{job['spec'].get('completions', 1)} succeeded",
+        )
+        return False
+
+    return True
+
+
 def _check_container_status(pod: Any, status: Any, is_init: bool = False) -> bool:
     del is_init
     good = status["ready"]
@@ -64,6 +232,17 @@ def _check_container_status(pod: Any, status: Any, is_init: bool = False) -> boo
     return True
 
 
+@_register(
+    "pods",
+    "Pod",
+    "/api/v1/namespaces/{namespace}/pods",
+    (
+        ("status.conditions", True),
+        ("status.phase", False),
+        ("status.initContainerStatuses", True),
+        ("status.containerStatuses", True),
+    ),
+)
 def _check_pod_status(pods: Any) -> bool:
     for pod in pods["items"]:
         for condition in pod["status"].get("conditions", []):
@@ -89,6 +268,303 @@ def _check_pod_status(pods: Any) -> bool:
     return True
 
 
+def _check(snapshot: dict[str, list[Any]]) -> bool:
+    success = True
+    for resource, items in snapshot.items():
+        success &= _WORKLOADS[resource].check({"items": items})
+    return success
+
+
+def _terminal_states(pods: list[Any], reasons: list[str], max_restarts: int) -> list[str]:
+    """
+    Get the messages of the containers in a state that will not recover.
+
+    A `CrashLoopBackOff` is only terminal after `max_restarts` restarts.
+    """
+    messages = []
+    for pod in pods:
+        for status in [
+            *pod["status"].get("initContainerStatuses", []),
+            *pod["status"].get("containerStatuses", []),
+        ]:
+            waiting = status.get("state", {}).get("waiting") or {}
+            reason = waiting.get("reason", "")
+            if reason not in reasons:
+                continue
+            if reason == "CrashLoopBackOff" and status.get("restartCount", 0) < max_restarts:
+                continue
+            message = waiting.get("message", "").split("\n")[0]
+            messages.append(f"{pod['metadata']['name']} {status['name']}: {reason} {message}".strip())
+    return messages
+
+
+def _fail_fast(snapshot: dict[str, list[Any]], args: argparse.Namespace) -> bool:
+    """Print the containers in a terminal state and return True if we should stop waiting."""
+    if not args.fail_fast:
+        return False
+    messages = _terminal_states(
+        snapshot["pods"],
+        args.terminal_reason or _TERMINAL_REASONS,
+        args.max_restarts,
+    )
+    for message in messages:
+        c2cciutils.error("k8s-wait", f"Container in terminal state, stop waiting: {message}")
+    failed_jobs = [job for job in snapshot.get("jobs", []) if _job_condition(job, "Failed") is not None]
+    for job in failed_jobs:
+        c2cciutils.error("k8s-wait", f"Job {job['metadata']['name']} failed, stop waiting")
+    return bool(messages or failed_jobs)
+
+
+def _print_ready(snapshot: dict[str, list[Any]]) -> None:
+    for resource, items in snapshot.items():
+        if items or resource == "pods":
+            print()
+            print(f"{_WORKLOADS[resource].kind}s ready:")
+            print("\n".join(item["metadata"]["name"] for item in items))
+
+
+def _get_items(arguments: list[str]) -> list[Any]:
+    result = subprocess.run(  # noqa: S603,S607,RUF100
+        ["kubectl", "get", *arguments, "--output=json"],  # noqa: S607
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return cast("list[Any]", json.loads(result.stdout)["items"])
+
+
+def _get_compact_items(arguments: list[str], resources: list[str]) -> Iterator[Any]:
+    """
+    Get only the fields used by the checks, one item per line.
+
+    The items are rebuilt with the same structure as the full objects.
+    """
+    projection = list(
+        dict.fromkeys([*_BASE_PROJECTION, *(field for r in resources for field in _WORKLOADS[r].fields)]),
+    )
+    template = '{"\\t"}'.join(f"{{.{path}}}" for path, _ in projection)
+    with subprocess.Popen(  # noqa: S603,S607,RUF100
+        ["kubectl", "get", *arguments, f'--output=jsonpath={{range .items[*]}}{template}{{"\\n"}}{{end}}'],  # noqa: S607
+        stdout=subprocess.PIPE,
+    ) as process:
+        assert process.stdout is not None
+        for line in process.stdout:
+            item: dict[str, Any] = {"metadata": {}, "spec": {}, "status": {}}
+            for (path, is_json), value in zip(
+                projection,
+                line.decode().rstrip("\n").split("\t"),
+                strict=True,
+            ):
+                if value:
+                    *parents, key = path.split(".")
+                    parent = item
+                    for parent_key in parents:
+                        parent = parent[parent_key]
+                    parent[key] = json.loads(value) if is_json else value
+            yield item
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+
+
+def _get_snapshot(
+    resources: list[str],
+    selector: str,
+    compact: bool = False,
+    namespace: str = "",
+) -> dict[str, list[Any]]:
+    """
+    Get all the resources, with one kubectl call without selector, or two with a selector.
+
+    The selector is only applied on the pods, on the server side, then when a selector is given the pods
+    are got with a second call, and the other kinds are combined in the first one.
+    """
+    snapshot: dict[str, list[Any]] = {resource: [] for resource in resources}
+    groups = (
+        [[resource for resource in resources if resource != "pods"], ["pods"]] if selector else [resources]
+    )
+    for group in groups:
+        if not group:
+            continue
+        arguments = [",".join(group)]
+        if group == ["pods"] and selector:
+            arguments.append(f"--selector={selector}")
+        if namespace:
+            arguments.append(f"--namespace={namespace}")
+        for item in _get_compact_items(arguments, group) if compact else _get_items(arguments):
+            resource = next(r for r, workload in _WORKLOADS.items() if workload.kind == item["kind"])
+            snapshot[resource].append(item)
+    return snapshot
+
+
+def _current_namespace() -> str:
+    namespace = (
+        subprocess.run(  # noqa: S603,S607,RUF100
+            ["kubectl", "config", "view", "--minify", "--output=jsonpath={..namespace}"],  # noqa: S607
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        .stdout.decode()
+        .strip()
+    )
+    return namespace or "default"
+
+
+class _Watcher(threading.Thread):
+    """
+    List the resources then watch them with the Kubernetes API.
+
+    The list is put in the queue as a `SYNC` event followed by the watch events (`ADDED`, `MODIFIED`,
+    `DELETED`), the watch starts at the resource version of the list to don't miss any change.
+    """
+
+    def __init__(
+        self,
+        resource: str,
+        path: str,
+        selector: str,
+        events: "queue.Queue[tuple[str, str, Any]]",
+    ) -> None:
+        """Construct."""
+        super().__init__(daemon=True)
+        self.resource = resource
+        self.path = path
+        self.params = {"labelSelector": selector} if selector else {}
+        self.events = events
+        self.process: subprocess.Popen[bytes] | None = None
+        self.stopped = False
+
+    def _raw_args(self, **params: str) -> list[str]:
+        return ["kubectl", "get", f"--raw={self.path}?{urllib.parse.urlencode({**self.params, **params})}"]
+
+    def run(self) -> None:
+        """Run."""
+        try:
+            while not self.stopped:
+                objects = json.loads(
+                    subprocess.run(self._raw_args(), stdout=subprocess.PIPE, check=True).stdout,  # noqa: S603
+                )
+                self.events.put((self.resource, "SYNC", objects["items"]))
+
+                self.process = subprocess.Popen(  # noqa: S603
+                    self._raw_args(watch="true", resourceVersion=objects["metadata"]["resourceVersion"]),
+                    stdout=subprocess.PIPE,
+                )
+                assert self.process.stdout is not None
+                for line in self.process.stdout:
+                    event = json.loads(line)
+                    if event["type"] == "ERROR":
+                        # Probably a too old resource version, list again
+                        break
+                    self.events.put((self.resource, event["type"], event["object"]))
+                self.process.terminate()
+                self.process.wait()
+        except subprocess.CalledProcessError as exception:
+            self.events.put((self.resource, "FAILED", exception))
+
+    def stop(self) -> None:
+        """Stop the watch."""
+        self.stopped = True
+        if self.process is not None:
+            self.process.terminate()
+
+
+def _wait_watch(args: argparse.Namespace, resources: list[str]) -> bool:
+    namespace = args.target_namespace or _current_namespace()
+    events: queue.Queue[tuple[str, str, Any]] = queue.Queue()
+    watchers = [
+        _Watcher(
+            resource,
+            _WORKLOADS[resource].api_path.format(namespace=namespace),
+            args.selector if resource == "pods" else "",
+            events,
+        )
+        for resource in resources
+    ]
+    for watcher in watchers:
+        watcher.start()
+
+    objects: dict[str, dict[str, Any]] = {}
+    last_output = None
+    deadline = time.monotonic() + args.nb_try * args.sleep
+    try:
+        while True:
+            try:
+                resource, event_type, value = events.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return False
+
+            if event_type == "FAILED":
+                raise value
+            if event_type == "SYNC":
+                objects[resource] = {item["metadata"]["name"]: item for item in value}
+            elif event_type == "DELETED":
+                objects[resource].pop(value["metadata"]["name"], None)
+            elif event_type in ("ADDED", "MODIFIED"):
+                objects[resource][value["metadata"]["name"]] = value
+            if len(objects) < len(resources):
+                continue
+
+            snapshot = {resource: list(objects[resource].values()) for resource in resources}
+            # Print the status only when it changes to avoid flooding the logs on each event
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                success = _check(snapshot)
+            if output.getvalue() != last_output:
+                last_output = output.getvalue()
+                print(last_output, end="")
+                sys.stdout.flush()
+            if success:
+                _print_ready(snapshot)
+                return True
+            if _fail_fast(snapshot, args):
+                return False
+    finally:
+        for watcher in watchers:
+            watcher.stop()
+
+
+def _without_options(arguments: list[str], options: list[str]) -> list[str]:
+    """Remove the options (with their values) from the command line arguments."""
+    result = []
+    skip_value = False
+    for argument in arguments:
+        if skip_value:
+            skip_value = False
+        elif argument in options:
+            skip_value = True
+        elif argument.split("=", 1)[0] not in options:
+            result.append(argument)
+    return result
+
+
+def _wait_target(arguments: list[str], target: str) -> tuple[bool, float, bytes]:
+    """Wait for one target in a sub process, get the success, the duration and the output."""
+    start = time.monotonic()
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "c2cciutils.scripts.k8s.wait", *arguments, f"--target={target}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        check=False,
+    )
+    return process.returncode == 0, time.monotonic() - start, process.stdout
+
+
+def _wait_targets(targets: list[str]) -> bool:
+    """Wait for all the targets concurrently, print the output of each target, then a summary."""
+    arguments = _without_options(sys.argv[1:], ["--target", "--namespace"])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        results = list(executor.map(lambda target: _wait_target(arguments, target), targets))
+
+    for target, (success, duration, output) in zip(targets, results, strict=True):
+        print(f"::group::Target {target}: {'ready' if success else 'not ready'} after {duration:.1f}s")
+        sys.stdout.flush()
+        sys.stdout.buffer.write(output)
+        print("::endgroup::")
+    print()
+    print("Targets:")
+    for target, (success, duration, _) in zip(targets, results, strict=True):
+        print(f"{target}: {'ready' if success else 'not ready'} after {duration:.1f}s")
+    return all(success for success, _, _ in results)
+
+
 def main() -> None:
     """Wait that the k8s application is ready."""
     parser = argparse.ArgumentParser(description="Get some logs to from k8s.")
@@ -100,6 +576,12 @@ def main() -> None:
         help="Selector (label query) to filter on, supports '=', '==', and '!='.(e.g. -l key1=value1,key2=value2)",
     )
     parser.add_argument("--no-deployments", dest="deployments", action="store_false")
+    parser.add_argument(
+        "--workloads",
+        default="deployments",
+        help="Comma separated list of the workloads to wait for, in addition to the pods, available: "
+        f"{', '.join(resource for resource in _WORKLOADS if resource != 'pods')} (default: %(default)s)",
+    )
     parser.add_argument(
         "--nb-try",
         default=20,
@@ -107,45 +589,73 @@ def main() -> None:
         help="Number of try to wait for the application to be ready",
     )
     parser.add_argument("--sleep", default=10, type=int, help="Sleep time before each try")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Watch the changes instead of polling, exit as soon as the application is ready, "
+        "the timeout is nb-try x sleep",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="On polling, get only the fields needed by the checks, useful on namespaces with many pods",
+    )
+    parser.add_argument(
+        "--no-fail-fast",
+        dest="fail_fast",
+        action="store_false",
+        help="Continue to wait even if a container is in a terminal state",
+    )
+    parser.add_argument(
+        "--terminal-reason",
+        action="append",
+        help=f"Waiting reason considered as terminal, can be repeated (default: {', '.join(_TERMINAL_REASONS)})",
+    )
+    parser.add_argument(
+        "--max-restarts",
+        default=3,
+        type=int,
+        help="Number of restarts before a CrashLoopBackOff is considered as terminal",
+    )
+    parser.add_argument(
+        "--target",
+        action="append",
+        help="Namespace and selector to wait for, as NAMESPACE:SELECTOR, can be repeated to wait for "
+        "several targets concurrently (override --selector)",
+    )
 
     args = parser.parse_args()
+    for target in args.target or []:
+        if ":" not in target:
+            parser.error(f"Invalid target, should be NAMESPACE:SELECTOR: {target}")
 
     if args.namespace:
         subprocess.run(["kubectl", "config", "set-context", "--current", "--namespace=default"], check=True)  # noqa: S607
 
+    if args.target and len(args.target) > 1:
+        sys.exit(0 if _wait_targets(args.target) else 1)
+    args.target_namespace = ""
+    if args.target:
+        args.target_namespace, _, args.selector = args.target[0].partition(":")
+
+    resources = [resource for resource in args.workloads.split(",") if resource]
+    for resource in resources:
+        if resource not in _WORKLOADS or resource == "pods":
+            parser.error(f"Unknown workload: {resource}")
+    if not args.deployments and "deployments" in resources:
+        resources.remove("deployments")
+    resources.append("pods")
+    if args.watch:
+        sys.exit(0 if _wait_watch(args, resources) else 1)
+
     for _ in range(args.nb_try):
         time.sleep(args.sleep)
-        success = True
-        deployements_names = []
-        if args.deployments:
-            deployments = subprocess.run(  # noqa: S603,S607,RUF100
-                ["kubectl", "get", "deployments", "--output=json"],  # noqa: S607
-                stdout=subprocess.PIPE,
-                check=True,
-            )
-            deployements_json = json.loads(deployments.stdout)
-            success &= _check_deployment_status(deployements_json)
-            deployements_names = [
-                deployment["metadata"]["name"] for deployment in json.loads(deployments.stdout)["items"]
-            ]
-
-        pods = subprocess.run(  # noqa: S603,S607,RUF100
-            ["kubectl", "get", "pods", "--output=json", f"--selector={args.selector}"],  # noqa: S607
-            stdout=subprocess.PIPE,
-            check=True,
-        )
-        pods_json = json.loads(pods.stdout)
-        success &= _check_pod_status(pods_json)
-        pods_name = [p["metadata"]["name"] for p in json.loads(pods.stdout)["items"]]
-        if success:
-            if deployements_names:
-                print()
-                print("Deployments ready:")
-                print("\n".join(deployements_names))
-            print()
-            print("Pods ready:")
-            print("\n".join(pods_name))
+        snapshot = _get_snapshot(resources, args.selector, args.compact, args.target_namespace)
+        if _check(snapshot):
+            _print_ready(snapshot)
             sys.exit(0)
+        if _fail_fast(snapshot, args):
+            sys.exit(1)
     sys.exit(1)
 
 
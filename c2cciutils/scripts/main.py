@@ -4,6 +4,9 @@
 """The main function of some utilities."""
 
 import argparse
+import contextlib
+import json
+import sys
 from importlib.metadata import version
 
 import yaml
@@ -16,15 +19,35 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Some utils of c2cciutils.")
     parser.add_argument("--get-config", action="store_true", help="display the current config")
     parser.add_argument("--version", action="store_true", help="display the current version")
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help="display the GitHub GraphQL API rate limit budget, as JSON",
+    )
+    parser.add_argument(
+        "--invalidate-cache",
+        action="store_true",
+        help="remove the cached GitHub metadata (default branch, repository, ...)",
+    )
 
     args = parser.parse_args()
 
+    if args.invalidate_cache:
+        c2cciutils.clear_metadata_cache()
+
     if args.get_config:
         print(yaml.dump(c2cciutils.get_config(), default_flow_style=False, Dumper=yaml.SafeDumper))
 
     if args.version:
         print(f"c2cciutils {version('c2cciutils')}")
 
+    if args.rate_limit:
+        client = c2cciutils.graphql_client()
+        # Only the JSON on the standard output, the headers are printed on the error output
+        with contextlib.redirect_stdout(sys.stderr):
+            client("rate_limit.graphql", {})
+        print(json.dumps(client.rate_limit._asdict() if client.rate_limit is not None else None))
+
 
 if __name__ == "__main__":
     main()